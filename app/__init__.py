@@ -6,7 +6,7 @@ from flask import Flask, g, request
 from flask_socketio import SocketIO
 
 from app.config import config
-from app.extensions import db, migrate, login_manager, bcrypt, mail, csrf, init_limiter
+from app.extensions import db, migrate, login_manager, bcrypt, mail, csrf, init_limiter, init_redis
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -47,6 +47,7 @@ def create_app(config_name=None):
         app,
         cors_allowed_origins=cors_origins,
         async_mode='threading',  # Threading mode works with gthread workers
+        message_queue=app.config.get('REDIS_URL'),  # Share rooms/emits across workers
         ping_timeout=30,         # Reduced timeout for faster reconnection
         ping_interval=15,        # More frequent pings for better connection health
         logger=False,            # Reduce logging noise
@@ -58,6 +59,13 @@ def create_app(config_name=None):
     if limiter:
         app.limiter = limiter
     
+    # Initialize Redis for shared rate-limit state (optional)
+    init_redis(app)
+    
+    # Cache mail subject prefix and sender
+    from app.services.email import init_email
+    init_email(app)
+    
     # Register blueprints
     from app.routes.main import main_bp
     from app.routes.auth import auth_bp
@@ -84,7 +92,8 @@ def create_app(config_name=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # profile and photos are lazy='joined', so this is a single SELECT
+        return db.session.get(User, int(user_id))
     
     # Request timing - start timer
     @app.before_request
@@ -214,9 +223,13 @@ def create_app(config_name=None):
         
         return response
     
-    # Create tables in development
+    # Create any missing tables. One table-name lookup replaces create_all's
+    # per-table existence checks; on an up-to-date schema nothing else runs
     with app.app_context():
-        db.create_all()
+        existing = set(db.inspect(db.engine).get_table_names())
+        missing = [t for t in db.metadata.sorted_tables if t.name not in existing]
+        if missing:
+            db.metadata.create_all(db.engine, tables=missing)
     
     return app
 
@@ -146,8 +146,9 @@ class Config:
     
     # File Upload
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB max
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
     UPLOAD_FOLDER = 'uploads'
+    PHOTO_PROCESSING_ASYNC = True  # Resize/upload photos off the request thread
     
     # Azure Blob Storage
     AZURE_STORAGE_CONNECTION_STRING = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
@@ -172,6 +173,9 @@ class Config:
     RECAPTCHA_TYPE = os.environ.get('RECAPTCHA_TYPE', 'v2')  # 'v2' or 'v3'
     RECAPTCHA_SCORE_THRESHOLD = 0.5  # For v3 only
     
+    # Redis (optional) - shares socket rate-limit state across workers
+    REDIS_URL = os.environ.get('REDIS_URL')
+    
     # Moderation
     ENABLE_AUTO_MODERATION = True
     MODERATION_ACTION_ON_FLAG = 'flag_for_review'  # 'none', 'flag_for_review', 'suspend'
@@ -245,12 +249,22 @@ class ProductionConfig(Config):
     # Override with production database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
 
+    # Keep enough pooled connections for gunicorn's threads plus Socket.IO and
+    # photo workers - overflow connections are closed on return, so an
+    # undersized pool pays a fresh TCP+TLS+auth handshake under load
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 12)),
+        'max_overflow': 8,
+        'pool_recycle': 1800,  # Retire connections before server-side idle cutoffs
+    }
+
 
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    PHOTO_PROCESSING_ASYNC = False
 
 
 config = {
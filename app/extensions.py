@@ -48,3 +48,27 @@ def init_limiter(app):
         app.logger.warning("Flask-Limiter not installed, rate limiting disabled")
         return None
 
+
+# Redis (optional - shared rate-limit state across workers; lazy init in app factory)
+redis_client = None
+
+
+def init_redis(app):
+    """Initialize Redis client if REDIS_URL is configured."""
+    global redis_client
+    redis_url = app.config.get('REDIS_URL')
+    if not redis_url:
+        return None
+    try:
+        import redis
+        
+        redis_client = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+        return redis_client
+    except ImportError:
+        app.logger.warning("redis not installed, using in-process rate limiting")
+        return None
+
+
+def get_redis():
+    """Get the Redis client, or None if not configured."""
+    return redis_client
@@ -1,6 +1,15 @@
 """Like, Match, and Pass models for the matching system."""
 from datetime import datetime
-from app.extensions import db
+import json
+import time
+from app.extensions import db, get_redis
+
+# Short-lived cache of conversation sidebar rows (plain dicts, not ORM objects).
+# Kept in Redis when REDIS_URL is set so every worker sees invalidations; the
+# in-process dict is only used without Redis (i.e. a single worker).
+# Structure: {user_id: (expires_at, rows)}
+_sidebar_cache = {}
+SIDEBAR_CACHE_TTL = 30  # seconds
 
 
 class Pass(db.Model):
@@ -111,8 +120,38 @@ class Like(db.Model):
                 is_match = True
         
         db.session.commit()
+
+        from app.models.user import User
+        User.invalidate_relationship_cache(liker_id, liked_id)
         return like, is_match
     
+    @staticmethod
+    def get_unmatched_likers(user_id):
+        """Get users who liked this user and aren't actively matched with them.
+
+        Single query: the NOT EXISTS probe uses the canonical
+        (user1_id < user2_id) ordering, so it is one equality lookup on
+        unique_match per liker.
+        """
+        from app.models.user import User
+        from sqlalchemy.orm import selectinload
+
+        already_matched = db.session.query(Match.id).filter(
+            Match.user1_id == db.case((User.id < user_id, User.id), else_=user_id),
+            Match.user2_id == db.case((User.id < user_id, user_id), else_=User.id),
+            Match.is_active == True
+        ).correlate(User).exists()
+
+        return User.query.join(
+            Like, Like.liker_id == User.id
+        ).options(
+            selectinload(User.photos),
+            selectinload(User.profile)
+        ).filter(
+            Like.liked_id == user_id,
+            ~already_matched
+        ).order_by(Like.created_at.desc()).all()
+
     def __repr__(self):
         return f'<Like {self.liker_id} -> {self.liked_id}>'
 
@@ -131,6 +170,8 @@ class Match(db.Model):
     is_active = db.Column(db.Boolean, default=True, index=True)
     unmatched_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     unmatched_at = db.Column(db.DateTime)
+    # Denormalized from blocks so send paths can check it without a query
+    blocked_by_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
 
     # Relationships
     user1 = db.relationship('User', foreign_keys=[user1_id])
@@ -153,12 +194,15 @@ class Match(db.Model):
         user2_id = max(user_a_id, user_b_id)
 
         # Check if match already exists
-        existing = Match.query.filter_by(user1_id=user1_id, user2_id=user2_id).first()
+        existing = Match.get_match(user1_id, user2_id, active_only=False)
         if existing:
             return existing
 
         match = Match(user1_id=user1_id, user2_id=user2_id)
         db.session.add(match)
+        from app.models.user import User
+        Match.invalidate_sidebar_cache(user1_id, user2_id)
+        User.invalidate_relationship_cache(user1_id, user2_id)
 
         # Send email notifications to both users (if they have notifications enabled)
         try:
@@ -194,11 +238,44 @@ class Match(db.Model):
             current_app.logger.error(f"Failed to send match notification: {e}")
     
     @staticmethod
-    def get_match(user_a_id, user_b_id):
-        """Get match between two users if it exists."""
-        user1_id = min(user_a_id, user_b_id)
-        user2_id = max(user_a_id, user_b_id)
-        return Match.query.filter_by(user1_id=user1_id, user2_id=user2_id, is_active=True).first()
+    def get_match(user_a_id, user_b_id, active_only=True):
+        """Get match between two users if it exists.
+
+        Matches are stored with user1_id < user2_id (see ordered_user_ids), so
+        a single equality on the unique (user1_id, user2_id) index finds the
+        pair regardless of argument order.
+        """
+        query = Match.query.filter_by(
+            user1_id=min(user_a_id, user_b_id),
+            user2_id=max(user_a_id, user_b_id)
+        )
+        if active_only:
+            query = query.filter_by(is_active=True)
+        return query.first()
+    
+    @staticmethod
+    def get_for_user(match_id, user_id):
+        """Get a match only if the user is part of it.
+
+        Authorization lives in the WHERE clause so callers need a single
+        round-trip, and only the columns needed for access checks are loaded.
+
+        Args:
+            match_id: ID of the match
+            user_id: ID of the user requesting access
+
+        Returns:
+            Match or None if it doesn't exist or the user isn't in it
+        """
+        from sqlalchemy.orm import load_only
+
+        return Match.query.options(
+            load_only(Match.id, Match.is_active, Match.user1_id, Match.user2_id,
+                      Match.blocked_by_user_id)
+        ).filter(
+            Match.id == match_id,
+            db.or_(Match.user1_id == user_id, Match.user2_id == user_id)
+        ).first()
     
     @staticmethod
     def get_user_matches(user_id):
@@ -213,11 +290,14 @@ class Match(db.Model):
         """Get all active matches with last message and unread count in a single query.
 
         OPTIMIZED: Returns matches with precomputed last_message_id, last_message_time,
-        and unread_count to avoid N+1 queries.
+        and unread_count to avoid N+1 queries, ordered by most recent activity
+        (last message time, falling back to matched_at) in SQL. Both users (with their eager-loaded
+        profile and photos) are fetched up front so get_other_user() never lazy-loads,
+        and the full messages collection is guarded with raiseload.
         """
         from app.models.message import Message
         from sqlalchemy import func, case, and_, desc
-        from sqlalchemy.orm import aliased
+        from sqlalchemy.orm import aliased, selectinload, raiseload
 
         # Subquery for last message per match
         last_msg_subq = db.session.query(
@@ -245,10 +325,17 @@ class Match(db.Model):
             last_msg_subq, Match.id == last_msg_subq.c.match_id
         ).outerjoin(
             unread_subq, Match.id == unread_subq.c.match_id
+        ).options(
+            selectinload(Match.user1),
+            selectinload(Match.user2),
+            raiseload(Match.messages)
         ).filter(
             db.or_(Match.user1_id == user_id, Match.user2_id == user_id),
             Match.is_active == True
-        ).order_by(Match.matched_at.desc()).all()
+        ).order_by(
+            # Most recent activity first: last message, else when they matched
+            desc(func.coalesce(last_msg_subq.c.last_message_time, Match.matched_at))
+        ).all()
 
         # Fetch all last messages in a single query
         last_message_ids = [r.last_message_id for r in results if r.last_message_id]
@@ -268,6 +355,65 @@ class Match(db.Model):
 
         return match_data
 
+    @staticmethod
+    def get_sidebar_conversations(user_id, ttl=SIDEBAR_CACHE_TTL):
+        """Get the conversation sidebar rows for a user, cached for ttl seconds.
+
+        Built from get_user_matches_with_details (the inbox query) so a page
+        navigation between conversations doesn't re-query every match.
+
+        Returns:
+            list of dicts with match_id, name, photo_url, unread_count, preview
+        """
+        key = f'sidebar:{user_id}'
+        redis_client = get_redis()
+        use_local = redis_client is None
+        if use_local:
+            cached = _sidebar_cache.get(user_id)
+            if cached and cached[0] > time.time():
+                return cached[1]
+        else:
+            try:
+                cached = redis_client.get(key)
+                if cached is not None:
+                    return json.loads(cached)
+            except Exception:
+                redis_client = None  # Fall through to the database, uncached
+
+        rows = []
+        for match in Match.get_user_matches_with_details(user_id):
+            other_user = match.get_other_user(user_id)
+            last_message = match.get_cached_last_message()
+            rows.append({
+                'match_id': match.id,
+                'name': other_user.display_name,
+                'photo_url': other_user.primary_photo_url,
+                'unread_count': match.get_cached_unread_count(),
+                'preview': last_message.content if last_message else None,
+            })
+
+        if redis_client is not None:
+            try:
+                redis_client.setex(key, ttl, json.dumps(rows))
+            except Exception:
+                pass
+        elif use_local:
+            _sidebar_cache[user_id] = (time.time() + ttl, rows)
+        return rows
+
+    @staticmethod
+    def invalidate_sidebar_cache(*user_ids):
+        """Drop cached sidebar rows for the given users."""
+        redis_client = get_redis()
+        if redis_client is None:
+            for user_id in user_ids:
+                _sidebar_cache.pop(user_id, None)
+            return
+        try:
+            redis_client.delete(*(f'sidebar:{user_id}' for user_id in user_ids))
+        except Exception:
+            pass  # Entries expire after SIDEBAR_CACHE_TTL anyway
+
     def get_cached_last_message(self):
         """Get cached last message (use after get_user_matches_with_details)."""
         return getattr(self, '_cached_last_message', None)
@@ -277,10 +423,22 @@ class Match(db.Model):
         return getattr(self, '_cached_unread_count', 0)
     
     def get_other_user(self, user_id):
-        """Get the other user in the match."""
-        if self.user1_id == user_id:
-            return self.user2
-        return self.user1
+        """Get the other user in the match.
+
+        Memoized on the instance, which lives in the session identity map for
+        the rest of the request, so repeated template calls are free.
+        """
+        cached = getattr(self, '_cached_other_user', None)
+        if cached is not None and cached[0] == user_id:
+            return cached[1]
+
+        other_user = self.user2 if self.user1_id == user_id else self.user1
+        self._cached_other_user = (user_id, other_user)
+        return other_user
+    
+    def is_blocked_for(self, user_id):
+        """Check if the other user in this match has blocked user_id (no query)."""
+        return self.blocked_by_user_id is not None and self.blocked_by_user_id != user_id
     
     def get_other_user_id(self, user_id):
         """Get the other user's ID in the match."""
@@ -294,6 +452,14 @@ class Match(db.Model):
         self.unmatched_by = user_id
         self.unmatched_at = datetime.utcnow()
         db.session.commit()
+        from app.models.user import User
+        Match.invalidate_sidebar_cache(self.user1_id, self.user2_id)
+        User.invalidate_relationship_cache(self.user1_id, self.user2_id)
+    
+    @property
+    def room(self):
+        """Socket.IO room name for this match's conversation."""
+        return f'match_{self.id}'
     
     @property
     def last_message(self):
@@ -1,4 +1,7 @@
 """Message model for chat functionality."""
+import base64
+import binascii
+import json
 from datetime import datetime
 from app.extensions import db
 
@@ -30,11 +33,22 @@ class Message(db.Model):
         db.Index('ix_messages_unread', 'match_id', 'sender_id', 'is_read'),
         # For message ordering within a conversation
         db.Index('ix_messages_match_created', 'match_id', 'created_at'),
+        # For cursor pagination: WHERE match_id=X AND (created_at, id) < (T, I)
+        db.Index('ix_messages_match_created_id', 'match_id', 'created_at', 'id'),
+        # For a user's sent messages in order (data export): WHERE sender_id=X ORDER BY created_at
+        db.Index('ix_messages_sender_created', 'sender_id', 'created_at'),
     )
     
     @staticmethod
     def send_message(match_id, sender_id, content):
         """Send a new message."""
+        from app.models.match import Match
+
+        # Callers have already loaded the match for their access check, so this
+        # is an identity-map hit; read the ids before commit expires them
+        match = db.session.get(Match, match_id)
+        participants = (match.user1_id, match.user2_id) if match else ()
+
         message = Message(
             match_id=match_id,
             sender_id=sender_id,
@@ -43,6 +57,9 @@ class Message(db.Model):
         db.session.add(message)
         db.session.commit()
 
+        # New preview and unread count for both participants' sidebars
+        Match.invalidate_sidebar_cache(*participants)
+
         # Send email notification to recipient (async, non-blocking)
         try:
             Message._send_message_notification(match_id, sender_id, content.strip())
@@ -91,23 +108,85 @@ class Message(db.Model):
             current_app.logger.error(f"Failed to send message notification: {e}")
     
     @staticmethod
-    def get_conversation(match_id, user_id, limit=50, before_id=None):
-        """Get messages for a conversation, excluding deleted ones for this user."""
+    def _conversation_query(match_id, user_id):
+        """Messages in a conversation, excluding ones deleted by this user."""
         query = Message.query.filter_by(match_id=match_id)
         
         # Exclude messages deleted by this user
-        query = query.filter(
+        return query.filter(
             db.or_(
                 db.and_(Message.sender_id == user_id, Message.deleted_by_sender == False),
                 db.and_(Message.sender_id != user_id, Message.deleted_by_receiver == False)
             )
         )
+    
+    @staticmethod
+    def get_conversation(match_id, user_id, limit=50, before_id=None):
+        """Get messages for a conversation, excluding deleted ones for this user."""
+        query = Message._conversation_query(match_id, user_id)
         
         if before_id:
             query = query.filter(Message.id < before_id)
         
         return query.order_by(Message.created_at.desc()).limit(limit).all()[::-1]
     
+    @staticmethod
+    def get_conversation_page(match_id, user_id, limit=50, cursor=None):
+        """Get one page of a conversation using keyset (cursor) pagination.
+
+        Pages walk backwards from the newest message, keyed on
+        (created_at, id), so each page is an index seek on
+        ix_messages_match_created_id no matter how long the conversation is.
+
+        Args:
+            match_id: Conversation to read
+            user_id: Viewing user (for per-user soft deletes)
+            limit: Page size
+            cursor: Opaque cursor from a previous page, or None for the newest page
+
+        Returns:
+            tuple: (messages oldest-first, next_cursor or None if no older messages)
+        """
+        query = Message._conversation_query(match_id, user_id)
+        
+        position = Message.decode_cursor(cursor)
+        if position:
+            query = query.filter(
+                db.tuple_(Message.created_at, Message.id) < position
+            )
+        
+        # Fetch one extra row to know whether an older page exists
+        rows = query.order_by(
+            Message.created_at.desc(), Message.id.desc()
+        ).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = Message.encode_cursor(rows[-1])
+        
+        return rows[::-1], next_cursor
+    
+    @staticmethod
+    def encode_cursor(message):
+        """Encode a message's (created_at, id) position as a URL-safe cursor."""
+        payload = json.dumps({
+            't': message.created_at.isoformat(),
+            'i': message.id,
+        }, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor into (created_at, id), or None if missing/invalid."""
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(payload['t']), int(payload['i'])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            return None
+    
     def mark_as_read(self):
         """Mark message as read."""
         if not self.is_read:
@@ -116,17 +195,32 @@ class Message(db.Model):
             db.session.commit()
     
     @staticmethod
-    def mark_conversation_read(match_id, user_id):
-        """Mark all messages in a conversation as read for a user."""
-        Message.query.filter(
+    def mark_conversation_read(match_id, user_id, up_to_id=None, commit=True):
+        """Mark messages in a conversation as read for a user.
+
+        Args:
+            match_id: ID of the match
+            user_id: ID of the reader
+            up_to_id: Only mark messages with id <= up_to_id (None marks all)
+            commit: Commit immediately; pass False to batch several updates
+        """
+        query = Message.query.filter(
             Message.match_id == match_id,
             Message.sender_id != user_id,
             Message.is_read == False
-        ).update({
+        )
+        if up_to_id is not None:
+            query = query.filter(Message.id <= up_to_id)
+        updated = query.update({
             'is_read': True,
             'read_at': datetime.utcnow()
-        })
-        db.session.commit()
+        }, synchronize_session=False)
+        if commit:
+            db.session.commit()
+
+        if updated:
+            from app.models.match import Match
+            Match.invalidate_sidebar_cache(user_id)
     
     def delete_for_user(self, user_id):
         """Soft delete message for a specific user."""
@@ -1,5 +1,5 @@
 """Photo model for user profile photos."""
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.extensions import db
 
 
@@ -14,6 +14,8 @@ class Photo(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     url = db.Column(db.String(500), nullable=False)
     thumbnail_url = db.Column(db.String(500))
+    processing_status = db.Column(db.String(20), default='ready')  # 'processing', 'ready', 'failed'
+    content_hash = db.Column(db.String(32))  # BLAKE2b of the uploaded bytes, for dedup
     
     # Metadata
     is_primary = db.Column(db.Boolean, default=False)
@@ -29,6 +31,38 @@ class Photo(db.Model):
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Ordered photo lookups per user (photos page, next-primary after delete)
+        db.Index('ix_photos_user_order', 'user_id', 'display_order'),
+        # One copy of the same image per user
+        db.Index('ix_photos_user_content_hash', 'user_id', 'content_hash', unique=True),
+    )
+    
+    # Shown in place of a photo until background processing has stored it
+    PLACEHOLDER_URL = '/static/images/default-avatar.svg'
+    
+    # Processing jobs only live in the worker's memory, so a photo still
+    # 'processing' after this long was lost to a restart and counts as failed
+    PROCESSING_TIMEOUT = timedelta(minutes=5)
+    
+    @property
+    def is_ready(self):
+        """Whether the photo has been processed and stored."""
+        return self.processing_status in (None, 'ready')
+    
+    @property
+    def is_failed(self):
+        """Whether processing failed or was abandoned past PROCESSING_TIMEOUT."""
+        if self.processing_status == 'failed':
+            return True
+        return (self.processing_status == 'processing' and self.created_at is not None
+                and datetime.utcnow() - self.created_at > Photo.PROCESSING_TIMEOUT)
+    
+    @property
+    def is_processing(self):
+        """Whether background processing is still expected to finish."""
+        return self.processing_status == 'processing' and not self.is_failed
+    
     @staticmethod
     def set_primary(user_id, photo_id):
         """Set a photo as primary, unsetting others."""
@@ -69,13 +103,13 @@ class Photo(db.Model):
 
     @staticmethod
     def get_pending_photos():
-        """Get all photos pending moderation."""
-        return Photo.query.filter_by(moderation_status='pending').order_by(Photo.created_at.asc()).all()
+        """Get all processed photos pending moderation."""
+        return Photo.query.filter_by(moderation_status='pending', processing_status='ready').order_by(Photo.created_at.asc()).all()
 
     @staticmethod
     def get_pending_count():
         """Get count of photos pending moderation."""
-        return Photo.query.filter_by(moderation_status='pending').count()
+        return Photo.query.filter_by(moderation_status='pending', processing_status='ready').count()
 
     def __repr__(self):
         return f'<Photo {self.id} (User {self.user_id})>'
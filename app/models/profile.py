@@ -55,7 +55,7 @@ class Profile(db.Model):
 
     # Church Attire & Modesty (Orthodox-specific)
     church_attire_women = db.Column(db.String(30))  # 'skirt_dress_only', 'modest_pants_ok', 'flexible'
-    modesty_level = db.Column(db.String(30))  # 'very_modest', 'modest', 'moderate', 'flexible'
+    modesty_level = db.Column(db.String(30), index=True)  # 'very_modest', 'modest', 'moderate', 'flexible'
 
     # Orthodox Sacraments & Practices
     confession_frequency = db.Column(db.String(30))  # 'regularly', 'before_communion', 'annually', 'major_feasts', 'rarely'
@@ -64,7 +64,7 @@ class Profile(db.Model):
     saints_nameday = db.Column(db.String(100))  # Patron saint name
 
     # Marital History (important for Orthodox wedding rules)
-    marital_history = db.Column(db.String(30))  # 'never_married', 'divorced_civil', 'divorced_church', 'widowed', 'annulled'
+    marital_history = db.Column(db.String(30), index=True)  # 'never_married', 'divorced_civil', 'divorced_church', 'widowed', 'annulled'
 
     # Family Planning
     desired_children_count = db.Column(db.String(20))  # '1-2', '3-4', '5+', 'as_god_wills', 'none'
@@ -1,6 +1,9 @@
 """Block and Report models for safety features."""
 from datetime import datetime
-from app.extensions import db
+from app.extensions import db, get_redis
+
+# Cached "blocked either way" id sets (see Block.get_blocked_either_way_ids)
+BLOCKED_IDS_CACHE_TTL = 300  # seconds
 
 
 class Block(db.Model):
@@ -28,13 +31,20 @@ class Block(db.Model):
         block = Block(blocker_id=blocker_id, blocked_id=blocked_id)
         db.session.add(block)
         
-        # Deactivate any existing match
+        # Record the block on the match and deactivate it if still active
         from app.models.match import Match
-        match = Match.get_match(blocker_id, blocked_id)
+        match = Match.get_match(blocker_id, blocked_id, active_only=False)
         if match:
-            match.unmatch(blocker_id)
+            if match.blocked_by_user_id is None:
+                match.blocked_by_user_id = blocker_id
+            if match.is_active:
+                match.unmatch(blocker_id)
         
         db.session.commit()
+        
+        from app.models.user import User
+        User.invalidate_relationship_cache(blocker_id, blocked_id)
+        Block.invalidate_blocked_ids_cache(blocker_id, blocked_id)
         return block
     
     @staticmethod
@@ -43,7 +53,19 @@ class Block(db.Model):
         block = Block.query.filter_by(blocker_id=blocker_id, blocked_id=blocked_id).first()
         if block:
             db.session.delete(block)
+            
+            # Keep the match's denormalized block state in sync
+            from app.models.match import Match
+            match = Match.get_match(blocker_id, blocked_id, active_only=False)
+            if match and match.blocked_by_user_id == blocker_id:
+                reverse = Block.query.filter_by(blocker_id=blocked_id, blocked_id=blocker_id).first()
+                match.blocked_by_user_id = blocked_id if reverse else None
+            
             db.session.commit()
+            
+            from app.models.user import User
+            User.invalidate_relationship_cache(blocker_id, blocked_id)
+            Block.invalidate_blocked_ids_cache(blocker_id, blocked_id)
             return True
         return False
     
@@ -59,6 +81,50 @@ class Block(db.Model):
         blocks = Block.query.filter_by(blocked_id=user_id).all()
         return [b.blocker_id for b in blocks]
     
+    @staticmethod
+    def get_blocked_either_way_ids(user_id):
+        """Get IDs of users this user blocked or was blocked by.
+
+        One UNION query, cached in Redis under blocked:{user_id} for
+        BLOCKED_IDS_CACHE_TTL seconds when REDIS_URL is configured.
+        block_user/unblock_user invalidate both users' entries.
+
+        Returns:
+            set: user IDs to hide from this user
+        """
+        key = f'blocked:{user_id}'
+        redis_client = get_redis()
+        if redis_client is not None:
+            try:
+                cached = redis_client.get(key)
+                if cached is not None:
+                    return {int(uid) for uid in cached.split(b',') if uid}
+            except Exception:
+                redis_client = None  # Fall through to the database
+
+        rows = db.session.query(Block.blocked_id).filter(Block.blocker_id == user_id).union(
+            db.session.query(Block.blocker_id).filter(Block.blocked_id == user_id)
+        ).all()
+        ids = {uid for (uid,) in rows}
+
+        if redis_client is not None:
+            try:
+                redis_client.setex(key, BLOCKED_IDS_CACHE_TTL, ','.join(map(str, ids)))
+            except Exception:
+                pass
+        return ids
+
+    @staticmethod
+    def invalidate_blocked_ids_cache(*user_ids):
+        """Drop cached blocked-id sets for the given users."""
+        redis_client = get_redis()
+        if redis_client is None or not user_ids:
+            return
+        try:
+            redis_client.delete(*(f'blocked:{uid}' for uid in user_ids))
+        except Exception:
+            pass  # Entries expire after BLOCKED_IDS_CACHE_TTL anyway
+
     def __repr__(self):
         return f'<Block {self.blocker_id} blocked {self.blocked_id}>'
 
@@ -91,6 +157,10 @@ class Report(db.Model):
     __table_args__ = (
         # For finding pending reports about a user
         db.Index('ix_reports_reported_status', 'reported_id', 'status'),
+        # For the "already reported" check (partial: only pending reports)
+        db.Index('ix_reports_pending_pair', 'reporter_id', 'reported_id',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
     )
     
     REASON_CHOICES = [
@@ -117,6 +187,17 @@ class Report(db.Model):
         db.session.commit()
         return report
     
+    @staticmethod
+    def has_pending_report(reporter_id, reported_id):
+        """Check if reporter already has a pending report about this user (EXISTS, no row load)."""
+        return db.session.query(
+            Report.query.filter_by(
+                reporter_id=reporter_id,
+                reported_id=reported_id,
+                status='pending'
+            ).exists()
+        ).scalar()
+    
     def resolve(self, admin_id, status, notes=None):
         """Mark report as resolved by admin."""
         self.resolved_by_id = admin_id
@@ -2,7 +2,11 @@
 from datetime import datetime
 import secrets
 from flask_login import UserMixin
-from app.extensions import db, bcrypt
+from app.extensions import db, bcrypt, get_redis
+
+# Cached viewer -> target relationship flags (see User.get_relationship)
+RELATIONSHIP_CACHE_TTL = 60  # seconds
+RELATIONSHIP_FLAGS = ('has_blocked', 'is_blocked_by', 'is_matched', 'has_liked')
 
 
 class User(UserMixin, db.Model):
@@ -211,18 +215,27 @@ class User(UserMixin, db.Model):
             return self.profile.first_name
         return self.email.split('@')[0]
     
+    @property
+    def ready_photos(self):
+        """Photos that have finished processing, in display order.
+        
+        Use this anywhere other users or admins see photos - rows still
+        processing (or failed) only carry the placeholder URL.
+        """
+        return [photo for photo in self.photos if photo.is_ready]
+    
     @property
     def primary_photo(self):
         """Get primary photo or first photo. Uses already-loaded photos to avoid N+1 queries."""
         # Use the photos relationship (eager-loaded) instead of new queries
-        if not self.photos:
+        ready_photos = self.ready_photos
+        if not ready_photos:
             return None
-        # Find primary photo in already-loaded collection
-        for photo in self.photos:
+        for photo in ready_photos:
             if photo.is_primary:
                 return photo
         # Fallback to first photo (already sorted by display_order)
-        return self.photos[0] if self.photos else None
+        return ready_photos[0]
     
     @property
     def primary_photo_url(self):
@@ -242,7 +255,9 @@ class User(UserMixin, db.Model):
     def has_liked(self, user):
         """Check if this user has liked another user."""
         from app.models.match import Like
-        return Like.query.filter_by(liker_id=self.id, liked_id=user.id).first() is not None
+        return db.session.query(
+            Like.query.filter_by(liker_id=self.id, liked_id=user.id).exists()
+        ).scalar()
     
     def is_matched_with(self, user):
         """Check if matched with another user."""
@@ -252,13 +267,67 @@ class User(UserMixin, db.Model):
     def has_blocked(self, user):
         """Check if this user has blocked another user."""
         from app.models.report import Block
-        return Block.query.filter_by(blocker_id=self.id, blocked_id=user.id).first() is not None
+        return db.session.query(
+            Block.query.filter_by(blocker_id=self.id, blocked_id=user.id).exists()
+        ).scalar()
     
     def is_blocked_by(self, user):
         """Check if this user is blocked by another user."""
         from app.models.report import Block
-        return Block.query.filter_by(blocker_id=user.id, blocked_id=self.id).first() is not None
+        return db.session.query(
+            Block.query.filter_by(blocker_id=user.id, blocked_id=self.id).exists()
+        ).scalar()
     
+    def get_relationship(self, user):
+        """Get block/match/like state between this user and another.
+
+        All four flags come from one SELECT of EXISTS probes and are cached
+        in Redis for RELATIONSHIP_CACHE_TTL seconds when REDIS_URL is set.
+        Block, like and match changes call invalidate_relationship_cache.
+
+        Returns:
+            dict: has_blocked, is_blocked_by, is_matched, has_liked (bools)
+        """
+        from app.models.match import Like, Match
+        from app.models.report import Block
+
+        key = f'rel:{self.id}:{user.id}'
+        redis_client = get_redis()
+        if redis_client is not None:
+            try:
+                cached = redis_client.get(key)
+                if cached is not None:
+                    return dict(zip(RELATIONSHIP_FLAGS, (c == ord('1') for c in cached)))
+            except Exception:
+                redis_client = None  # Fall through to the database
+
+        row = db.session.query(
+            Block.query.filter_by(blocker_id=self.id, blocked_id=user.id).exists(),
+            Block.query.filter_by(blocker_id=user.id, blocked_id=self.id).exists(),
+            Match.query.filter_by(user1_id=min(self.id, user.id), user2_id=max(self.id, user.id),
+                                  is_active=True).exists(),
+            Like.query.filter_by(liker_id=self.id, liked_id=user.id).exists(),
+        ).one()
+
+        if redis_client is not None:
+            try:
+                redis_client.setex(key, RELATIONSHIP_CACHE_TTL,
+                                   ''.join('1' if flag else '0' for flag in row))
+            except Exception:
+                pass
+        return dict(zip(RELATIONSHIP_FLAGS, map(bool, row)))
+
+    @staticmethod
+    def invalidate_relationship_cache(user_a_id, user_b_id):
+        """Drop cached relationship flags for a pair, in both directions."""
+        redis_client = get_redis()
+        if redis_client is None:
+            return
+        try:
+            redis_client.delete(f'rel:{user_a_id}:{user_b_id}', f'rel:{user_b_id}:{user_a_id}')
+        except Exception:
+            pass  # Entries expire after RELATIONSHIP_CACHE_TTL anyway
+
     def __repr__(self):
         return f'<User {self.email}>'
 
@@ -115,7 +115,8 @@ def inject_admin_counts():
                 .filter(Report.status == 'pending')
                 .scalar_subquery().label('pending_reports'),
             db.session.query(func.count(Photo.id))
-                .filter(Photo.moderation_status == 'pending')
+                .filter(Photo.moderation_status == 'pending',
+                        Photo.processing_status == 'ready')
                 .scalar_subquery().label('pending_photos')
         ).first()
 
@@ -751,8 +752,9 @@ def photos():
 
     query = Photo.query.options(joinedload(Photo.user))
 
+    # Photos still processing only carry the placeholder - nothing to review yet
     if status == 'pending':
-        query = query.filter_by(moderation_status='pending')
+        query = query.filter_by(moderation_status='pending', processing_status='ready')
     elif status == 'approved':
         query = query.filter_by(moderation_status='approved')
     elif status == 'rejected':
@@ -761,7 +763,7 @@ def photos():
     photos = query.order_by(Photo.created_at.desc()).paginate(page=page, per_page=20)
 
     # Stats
-    pending_count = Photo.query.filter_by(moderation_status='pending').count()
+    pending_count = Photo.query.filter_by(moderation_status='pending', processing_status='ready').count()
     approved_count = Photo.query.filter_by(moderation_status='approved').count()
     rejected_count = Photo.query.filter_by(moderation_status='rejected').count()
 
@@ -807,7 +809,7 @@ def approve_all_photos():
     """Approve all pending photos."""
     from app.models.photo import Photo
 
-    pending = Photo.query.filter_by(moderation_status='pending').all()
+    pending = Photo.query.filter_by(moderation_status='pending', processing_status='ready').all()
     count = len(pending)
 
     for photo in pending:
@@ -1,9 +1,9 @@
 """Discovery and matching routes."""
 import time
-from collections import defaultdict
+from array import array
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import and_, or_, not_
+from sqlalchemy import not_
 from sqlalchemy.orm import joinedload
 from app.extensions import db
 from app.models.user import User
@@ -19,8 +19,24 @@ discover_bp = Blueprint('discover', __name__)
 # Rate limiting for swipe actions (likes, passes, super likes)
 # Prevents spam and abuse
 MAX_INTERACTIONS_PER_MINUTE = 60  # Max swipes per minute
-_interaction_rate_limits = defaultdict(list)
 RATE_LIMIT_WINDOW = 60  # seconds
+RATE_LIMIT_BUCKET_SECONDS = 10  # sliding window granularity
+RATE_LIMIT_BUCKETS = RATE_LIMIT_WINDOW // RATE_LIMIT_BUCKET_SECONDS
+
+# Bucketed sliding window per user: a ring of per-10s counters
+# Structure: {user_id: [buckets: array('H'), head_index, head_bucket]}
+_interaction_rate_limits = {}
+
+
+def _advance_interaction_buckets(state, now_bucket):
+    """Rotate a user's ring forward to now_bucket, zeroing expired buckets."""
+    buckets, head_index, head_bucket = state
+    steps = min(now_bucket - head_bucket, RATE_LIMIT_BUCKETS)
+    for _ in range(steps):
+        head_index = (head_index + 1) % RATE_LIMIT_BUCKETS
+        buckets[head_index] = 0
+    state[1] = head_index
+    state[2] = now_bucket
 
 
 def check_interaction_rate_limit(user_id):
@@ -29,15 +45,12 @@ def check_interaction_rate_limit(user_id):
     Returns:
         tuple: (allowed: bool, remaining: int)
     """
-    now = time.time()
-    window_start = now - RATE_LIMIT_WINDOW
+    state = _interaction_rate_limits.get(user_id)
+    if state is None:
+        return True, MAX_INTERACTIONS_PER_MINUTE
 
-    # Clean old entries
-    _interaction_rate_limits[user_id] = [
-        ts for ts in _interaction_rate_limits[user_id] if ts > window_start
-    ]
-
-    current_count = len(_interaction_rate_limits[user_id])
+    _advance_interaction_buckets(state, int(time.time()) // RATE_LIMIT_BUCKET_SECONDS)
+    current_count = sum(state[0])
 
     if current_count >= MAX_INTERACTIONS_PER_MINUTE:
         return False, 0
@@ -47,7 +60,15 @@ def check_interaction_rate_limit(user_id):
 
 def record_interaction(user_id):
     """Record an interaction for rate limiting purposes."""
-    _interaction_rate_limits[user_id].append(time.time())
+    now_bucket = int(time.time()) // RATE_LIMIT_BUCKET_SECONDS
+    state = _interaction_rate_limits.get(user_id)
+    if state is None:
+        # Only allocate the ring for a user's first interaction
+        state = [array('H', bytes(2 * RATE_LIMIT_BUCKETS)), 0, now_bucket]
+        _interaction_rate_limits[user_id] = state
+    else:
+        _advance_interaction_buckets(state, now_bucket)
+    state[0][state[1]] += 1
 
 
 def get_potential_matches(user, filters=None, page=1, per_page=20):
@@ -78,10 +99,8 @@ def get_potential_matches(user, filters=None, page=1, per_page=20):
         Profile.bio.isnot(None),
     )
     
-    # Exclude blocked users (both directions)
-    blocked_ids = Block.get_blocked_ids(user.id)
-    blocker_ids = Block.get_blocker_ids(user.id)
-    excluded_ids = set(blocked_ids + blocker_ids)
+    # Exclude blocked users (both directions; cached)
+    excluded_ids = Block.get_blocked_either_way_ids(user.id)
     
     # Exclude users already liked
     liked_ids = [like.liked_id for like in user.likes_sent]
@@ -284,7 +303,8 @@ def like_user(user_id):
     target_user = User.query.get_or_404(user_id)
 
     # Check if blocked
-    if current_user.has_blocked(target_user) or current_user.is_blocked_by(target_user):
+    relationship = current_user.get_relationship(target_user)
+    if relationship['has_blocked'] or relationship['is_blocked_by']:
         if is_swipe_mode:
             return jsonify({'error': 'Cannot interact with this user'}), 403
         flash('Cannot interact with this user.', 'error')
@@ -300,12 +320,7 @@ def like_user(user_id):
     if is_swipe_mode:
         response = {'success': True, 'is_match': is_match}
         if is_match:
-            match = Match.query.filter(
-                or_(
-                    and_(Match.user1_id == current_user.id, Match.user2_id == user_id),
-                    and_(Match.user1_id == user_id, Match.user2_id == current_user.id)
-                )
-            ).first()
+            match = Match.get_match(current_user.id, user_id, active_only=False)
             response['matched_user_name'] = target_user.display_name
             response['match_id'] = match.id if match else None
         return jsonify(response)
@@ -401,7 +416,8 @@ def super_like_user(user_id):
     target_user = User.query.get_or_404(user_id)
 
     # Check if blocked
-    if current_user.has_blocked(target_user) or current_user.is_blocked_by(target_user):
+    relationship = current_user.get_relationship(target_user)
+    if relationship['has_blocked'] or relationship['is_blocked_by']:
         if is_swipe_mode:
             return jsonify({'error': 'Cannot interact with this user'}), 403
         flash('Cannot interact with this user.', 'error')
@@ -429,12 +445,7 @@ def super_like_user(user_id):
             'super_likes_remaining': remaining
         }
         if is_match:
-            match = Match.query.filter(
-                or_(
-                    and_(Match.user1_id == current_user.id, Match.user2_id == user_id),
-                    and_(Match.user1_id == user_id, Match.user2_id == current_user.id)
-                )
-            ).first()
+            match = Match.get_match(current_user.id, user_id, active_only=False)
             response['matched_user_name'] = target_user.display_name
             response['match_id'] = match.id if match else None
         return jsonify(response)
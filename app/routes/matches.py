@@ -2,8 +2,10 @@
 from datetime import datetime
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
 from app.extensions import db
 from app.models.match import Match, Like
+from app.models.user import User
 from app.models.report import Block, Report
 from app.forms.messages import ReportForm
 from app.utils.decorators import email_verified_required
@@ -22,7 +24,8 @@ def list():
     # Single optimized query gets matches + last message + unread count
     matches = Match.get_user_matches_with_details(current_user.id)
 
-    # Separate new matches (no messages) from conversations
+    # Separate new matches (no messages) from conversations; both keep the
+    # query's most-recent-activity order
     new_matches = []
     conversations = []
 
@@ -33,15 +36,11 @@ def list():
         else:
             conversations.append(match)
 
-    # Sort conversations by last message time (most recent first)
-    # Using cached time instead of accessing relationship
-    conversations.sort(
-        key=lambda m: getattr(m, '_cached_last_message_time', None) or m.matched_at,
-        reverse=True
-    )
-
     # Get pending likes (people who liked you but you haven't liked back)
-    pending_likes = Like.query.filter(
+    # Likers are loaded in one extra query instead of one per like in the template
+    pending_likes = Like.query.options(
+        selectinload(Like.liker)
+    ).filter(
         Like.liked_id == current_user.id,
         ~Like.liker_id.in_(
             db.session.query(Like.liked_id).filter(Like.liker_id == current_user.id)
@@ -81,7 +80,6 @@ def block_user(user_id):
         flash('You cannot block yourself.', 'error')
         return redirect(url_for('matches.list'))
     
-    from app.models.user import User
     target_user = User.query.get_or_404(user_id)
     
     Block.block_user(current_user.id, user_id)
@@ -108,7 +106,6 @@ def report_user(user_id):
         flash('You cannot report yourself.', 'error')
         return redirect(url_for('matches.list'))
     
-    from app.models.user import User
     target_user = User.query.get_or_404(user_id)
     
     form = ReportForm()
@@ -141,31 +138,8 @@ def who_likes_me():
         flash('This is a premium feature.', 'info')
         return redirect(url_for('matches.list'))
 
-    from app.models.user import User
-    from sqlalchemy.orm import joinedload
-
-    # Get IDs of users we're already matched with
-    matched_user_ids = db.session.query(
-        db.case(
-            (Match.user1_id == current_user.id, Match.user2_id),
-            else_=Match.user1_id
-        )
-    ).filter(
-        db.or_(Match.user1_id == current_user.id, Match.user2_id == current_user.id),
-        Match.is_active == True
-    ).all()
-    matched_ids = {uid[0] for uid in matched_user_ids}
-
-    # Get users who liked us but aren't matched yet (single query with eager loading)
-    likers = User.query.join(
-        Like, Like.liker_id == User.id
-    ).options(
-        joinedload(User.photos),
-        joinedload(User.profile)
-    ).filter(
-        Like.liked_id == current_user.id,
-        ~User.id.in_(matched_ids) if matched_ids else True
-    ).order_by(Like.created_at.desc()).all()
+    # Users who liked us but aren't matched yet (single query with eager loading)
+    likers = Like.get_unmatched_likers(current_user.id)
 
     return render_template('matches/who_likes_me.html', users=likers)
 
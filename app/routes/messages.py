@@ -1,12 +1,15 @@
 """Messaging routes with security hardening and rate limiting."""
 from datetime import datetime
 from collections import defaultdict
+from functools import lru_cache
+import threading
 import time
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import Blueprint, render_template, stream_template, redirect, url_for, flash, request, jsonify, current_app
+from flask_wtf.csrf import generate_csrf
 from flask_login import login_required, current_user
 from flask_socketio import emit, join_room, leave_room
 from app import socketio
-from app.extensions import db
+from app.extensions import db, get_redis
 from app.models.match import Match
 from app.models.message import Message
 from app.forms.messages import MessageForm
@@ -26,37 +29,307 @@ MAX_MESSAGE_LENGTH = 5000
 MIN_MESSAGE_LENGTH = 1
 MAX_MESSAGES_PER_MINUTE = 30  # Rate limit
 
-# In-memory rate limiting for Socket.IO (per user)
-# Structure: {user_id: [(timestamp1, timestamp2, ...)]}
-_socket_rate_limits = defaultdict(list)
+# In-memory token bucket rate limiting for Socket.IO (per user)
+# Integer arithmetic on time.monotonic_ns(): one token is TOKEN_UNIT bucket
+# units, so refilling is elapsed_ns * MAX_MESSAGES_PER_MINUTE with no floats.
+# Structure: {user_id: (level, last_refill_ns)}
+_socket_rate_limits = {}
 RATE_LIMIT_WINDOW = 60  # seconds
+RATE_LIMIT_WINDOW_NS = RATE_LIMIT_WINDOW * 1_000_000_000
+TOKEN_UNIT = RATE_LIMIT_WINDOW_NS  # bucket units per token
+BUCKET_CAPACITY = MAX_MESSAGES_PER_MINUTE * TOKEN_UNIT
+NS_PER_TOKEN = RATE_LIMIT_WINDOW_NS // MAX_MESSAGES_PER_MINUTE
+RATE_LIMIT_SWEEP_INTERVAL_NS = 300 * 1_000_000_000  # between stale-bucket sweeps
+_last_rate_limit_sweep = time.monotonic_ns()
+
+
+def _sweep_socket_rate_limits(now_ns):
+    """Drop buckets that have refilled completely.
+
+    A full bucket behaves exactly like a missing one, so removing it keeps
+    the dict bounded by the number of recently active senders. Buckets in
+    debt (level below zero after concurrent sends) need longer than one
+    window to refill and are kept until they do, like the Redis key's TTL.
+    """
+    for user_id, (level, last_refill) in list(_socket_rate_limits.items()):
+        if level + (now_ns - last_refill) * MAX_MESSAGES_PER_MINUTE >= BUCKET_CAPACITY:
+            _socket_rate_limits.pop(user_id, None)
+    for user_id, denied_until in list(_socket_denied_until.items()):
+        if denied_until < now_ns:
+            _socket_denied_until.pop(user_id, None)
+
+
+@lru_cache(maxsize=1440)
+def _format_clock(hour, minute):
+    """12-hour clock string for an (hour, minute) pair - one entry per minute of the day."""
+    return f'{(hour % 12) or 12:02d}:{minute:02d} {"AM" if hour < 12 else "PM"}'
+
+
+def format_message_time(dt):
+    """Format a timestamp as '%I:%M %p' without calling strftime per message."""
+    return _format_clock(dt.hour, dt.minute)
+
+
+@lru_cache(maxsize=8)
+def _iso_second(epoch_second):
+    """UTC ISO timestamp for an epoch second (typing events only need 1s precision)."""
+    return datetime.utcfromtimestamp(epoch_second).isoformat()
+
+
+def utc_now_iso():
+    """Current UTC time as ISO string, formatted at most once per second."""
+    return _iso_second(int(time.time()))
+
+
+# Atomic token bucket for Redis, shared by all workers
+# KEYS[1] = bucket key; ARGV = max_tokens, interval_ms, refill_per_interval, now_ms, cost
+# cost 0 only checks the bucket; cost 1 takes a token for a sent message
+# Returns {allowed (0/1), tokens_remaining}
+TOKEN_BUCKET_LUA = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last_refill')
+local max_tokens = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local refill = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local cost = tonumber(ARGV[5])
+
+local tokens = tonumber(bucket[1]) or max_tokens
+local last_refill = tonumber(bucket[2]) or now
+tokens = math.min(max_tokens, tokens + math.max(0, now - last_refill) * refill / interval)
+
+local allowed = 0
+if tokens >= 1 then
+    allowed = 1
+end
+
+if cost > 0 then
+    tokens = tokens - cost
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'last_refill', now)
+    -- Expire once the bucket would be full again (a missing key means a full bucket)
+    redis.call('PEXPIRE', KEYS[1], math.max(1, math.ceil((max_tokens - tokens) / refill * interval)))
+end
+return {allowed, math.max(0, math.floor(tokens))}
+"""
+_token_bucket_script = None
+
+# Local "denied until" cache so a flooding user doesn't cost a Redis round trip
+# Structure: {user_id: monotonic ns when the next token becomes available}
+_socket_denied_until = {}
 
 
 def check_socket_rate_limit(user_id):
-    """Check if user has exceeded socket message rate limit.
+    """Check the user's message token bucket without consuming a token.
+
+    Call before validating a send; only messages that are actually saved
+    count against the limit (see record_socket_message).
 
     Returns:
         tuple: (allowed: bool, messages_remaining: int)
     """
-    now = time.time()
-    window_start = now - RATE_LIMIT_WINDOW
+    return _apply_rate_limit(user_id, 0)
 
-    # Clean old entries
-    _socket_rate_limits[user_id] = [
-        ts for ts in _socket_rate_limits[user_id] if ts > window_start
-    ]
 
-    current_count = len(_socket_rate_limits[user_id])
+def record_socket_message(user_id):
+    """Take a token from the user's bucket for a message that was saved."""
+    _apply_rate_limit(user_id, 1)
+
+
+def _apply_rate_limit(user_id, cost):
+    """Check the bucket and take `cost` tokens (0 or 1) from it.
+
+    Uses Redis when REDIS_URL is configured so the limit holds across
+    gunicorn workers; otherwise (or if Redis errors) falls back to the
+    in-process bucket.
+    """
+    global _last_rate_limit_sweep
+
+    # Periodically evict idle entries so long-running workers don't leak memory
+    now_ns = time.monotonic_ns()
+    if now_ns - _last_rate_limit_sweep > RATE_LIMIT_SWEEP_INTERVAL_NS:
+        _last_rate_limit_sweep = now_ns
+        _sweep_socket_rate_limits(now_ns)
 
-    if current_count >= MAX_MESSAGES_PER_MINUTE:
+    redis_client = get_redis()
+    if redis_client is not None:
+        try:
+            return _check_redis_rate_limit(redis_client, user_id, now_ns, cost)
+        except Exception as e:
+            current_app.logger.warning(f"Redis rate limit failed, using local bucket: {e}")
+
+    return _check_local_rate_limit(user_id, now_ns, cost)
+
+
+def _check_redis_rate_limit(redis_client, user_id, now_ns, cost):
+    """Token bucket check against Redis via the atomic Lua script."""
+    global _token_bucket_script
+
+    denied_until = _socket_denied_until.get(user_id)
+    if denied_until is not None and not cost:
+        if now_ns < denied_until:
+            return False, 0
+        _socket_denied_until.pop(user_id, None)
+
+    if _token_bucket_script is None:
+        _token_bucket_script = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+    allowed, remaining = _token_bucket_script(
+        keys=[f'user:{user_id}:bucket'],
+        args=[MAX_MESSAGES_PER_MINUTE, RATE_LIMIT_WINDOW * 1000,
+              MAX_MESSAGES_PER_MINUTE, time.time_ns() // 1_000_000,  # wall clock, shared across hosts
+              cost]
+    )
+
+    if not allowed:
+        if not cost:
+            # Less than one token left; the next one arrives within NS_PER_TOKEN
+            _socket_denied_until[user_id] = now_ns + NS_PER_TOKEN
         return False, 0
 
-    return True, MAX_MESSAGES_PER_MINUTE - current_count
+    return True, int(remaining)
 
 
-def record_socket_message(user_id):
-    """Record a message for rate limiting purposes."""
-    _socket_rate_limits[user_id].append(time.time())
+def _check_local_rate_limit(user_id, now_ns, cost):
+    """In-process token bucket (per worker).
+
+    The bucket holds up to MAX_MESSAGES_PER_MINUTE tokens and refills
+    continuously over RATE_LIMIT_WINDOW, so each check is O(1) integer math
+    and stores only two ints per user.
+    """
+    level, last_refill = _socket_rate_limits.get(user_id, (BUCKET_CAPACITY, now_ns))
+
+    # Refill for the time elapsed since the last check
+    level = min(BUCKET_CAPACITY, level + (now_ns - last_refill) * MAX_MESSAGES_PER_MINUTE)
+    allowed = level >= TOKEN_UNIT
+
+    if cost:
+        # May dip below zero when concurrent sends all passed the check;
+        # the debt is simply paid back by the refill
+        level -= cost * TOKEN_UNIT
+        _socket_rate_limits[user_id] = (level, now_ns)
+
+    return allowed, max(0, level // TOKEN_UNIT)
+
+
+# Coalescing queue for outgoing new_message events
+# Structure: {room: [payload, ...]}, flushed as one 'new_messages' frame per room
+_pending_emits = defaultdict(list)
+_pending_emits_lock = threading.Lock()
+_emit_flusher_running = False
+EMIT_FLUSH_INTERVAL = 0.01  # seconds to wait for more events before flushing
+MAX_EMIT_BATCH = 32  # max messages per frame
+MAX_EMIT_BATCH_BYTES = 64 * 1024  # max message content per frame
+
+
+def queue_room_emit(room, payload):
+    """Queue a new_message payload for a room and schedule a flush.
+
+    Events arriving within EMIT_FLUSH_INTERVAL are sent together, so a burst
+    of messages costs one frame per client instead of one per message.
+    """
+    global _emit_flusher_running
+
+    with _pending_emits_lock:
+        _pending_emits[room].append(payload)
+        if _emit_flusher_running:
+            return
+        _emit_flusher_running = True
+
+    socketio.start_background_task(_flush_pending_emits)
+
+
+def _iter_emit_batches(payloads):
+    """Split payloads into batches capped by count and content size."""
+    batch, batch_bytes = [], 0
+    for payload in payloads:
+        payload_bytes = len(payload.get('content', ''))
+        if batch and (len(batch) >= MAX_EMIT_BATCH or
+                      batch_bytes + payload_bytes > MAX_EMIT_BATCH_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(payload)
+        batch_bytes += payload_bytes
+    if batch:
+        yield batch
+
+
+def _flush_pending_emits():
+    """Emit everything queued during the coalescing window."""
+    global _emit_flusher_running
+
+    socketio.sleep(EMIT_FLUSH_INTERVAL)
+
+    with _pending_emits_lock:
+        pending = dict(_pending_emits)
+        _pending_emits.clear()
+        _emit_flusher_running = False
+
+    # python-socketio encodes a room emit once and reuses the frame for every
+    # participant as long as no callback is passed - keep it that way
+    for room, payloads in pending.items():
+        for batch in _iter_emit_batches(payloads):
+            socketio.emit('new_messages', batch, room=room)
+
+
+# Coalescing queue for socket read receipts
+# Structure: {(user_id, match_id): (up_to_id or None for all, reader sid)}
+_pending_reads = {}
+_pending_reads_lock = threading.Lock()
+_read_flusher_running = False
+READ_FLUSH_INTERVAL = 0.2  # seconds
+
+
+def queue_mark_read(match_id, user_id, up_to_id, sid):
+    """Queue a read receipt; one UPDATE and one emit per conversation per window.
+
+    A client scrolling through a burst of messages sends many mark_read
+    events - only the highest message id seen in the window matters.
+    """
+    global _read_flusher_running
+
+    key = (user_id, match_id)
+    with _pending_reads_lock:
+        previous = _pending_reads.get(key)
+        if previous is not None and (previous[0] is None or up_to_id is None):
+            up_to_id = None
+        elif previous is not None:
+            up_to_id = max(previous[0], up_to_id)
+        _pending_reads[key] = (up_to_id, sid)
+        if _read_flusher_running:
+            return
+        _read_flusher_running = True
+
+    socketio.start_background_task(_flush_pending_reads, current_app._get_current_object())
+
+
+def _flush_pending_reads(app):
+    """Apply queued read receipts in one transaction, then notify the rooms."""
+    global _read_flusher_running
+
+    socketio.sleep(READ_FLUSH_INTERVAL)
+
+    with _pending_reads_lock:
+        pending = dict(_pending_reads)
+        _pending_reads.clear()
+        _read_flusher_running = False
+
+    with app.app_context():
+        try:
+            for (user_id, match_id), (up_to_id, _) in pending.items():
+                Message.mark_conversation_read(match_id, user_id, up_to_id=up_to_id, commit=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to flush read receipts: {e}")
+            return
+
+    read_at = format_message_time(datetime.utcnow())
+    for (user_id, match_id), (_, sid) in pending.items():
+        # Broadcast read receipt to the room so sender knows their messages were read
+        socketio.emit('messages_read', {
+            'match_id': match_id,
+            'read_by': user_id,
+            'read_at': read_at,
+        }, room=f'match_{match_id}', skip_sid=sid)
 
 
 @messages_bp.route('/')
@@ -67,7 +340,8 @@ def inbox():
 
     OPTIMIZED: Uses get_user_matches_with_details to avoid N+1 queries.
     """
-    # Single optimized query gets matches + last message + unread count
+    # Single optimized query gets matches + last message + unread count,
+    # already ordered by most recent activity
     matches = Match.get_user_matches_with_details(current_user.id)
 
     conversations = []
@@ -84,12 +358,6 @@ def inbox():
             'unread_count': unread,
         })
 
-    # Sort by last message time (already sorted by matched_at, resort by message time)
-    conversations.sort(
-        key=lambda x: x['last_message'].created_at if x['last_message'] else x['match'].matched_at,
-        reverse=True
-    )
-
     return render_template('messages/inbox.html', conversations=conversations)
 
 
@@ -98,10 +366,9 @@ def inbox():
 @email_verified_required
 def conversation(match_id):
     """View messages in a conversation."""
-    match = Match.query.get_or_404(match_id)
-    
-    # Verify current user is part of this match
-    if match.user1_id != current_user.id and match.user2_id != current_user.id:
+    # Fetch the match only if current user is part of it
+    match = Match.get_for_user(match_id, current_user.id)
+    if not match:
         flash('Invalid conversation.', 'error')
         return redirect(url_for('messages.inbox'))
     
@@ -114,20 +381,32 @@ def conversation(match_id):
     # Mark messages as read
     Message.mark_conversation_read(match_id, current_user.id)
     
-    # Get messages
-    messages = Message.get_conversation(match_id, current_user.id)
+    # Get one page of messages (newest first page, older pages via ?cursor=)
+    per_page = current_app.config.get('MESSAGES_PER_PAGE', 50)
+    limit = max(1, min(request.args.get('limit', per_page, type=int), per_page))
+    messages, next_cursor = Message.get_conversation_page(
+        match_id, current_user.id, limit=limit, cursor=request.args.get('cursor')
+    )
     
-    # Get all matches for sidebar
-    all_matches = Match.get_user_matches(current_user.id)
+    # Sidebar rows (shares the inbox query, cached briefly across navigations)
+    sidebar = Match.get_sidebar_conversations(current_user.id)
     
     form = MessageForm()
     
-    return render_template('messages/conversation.html',
-                          match=match,
-                          other_user=other_user,
-                          messages=messages,
-                          all_matches=all_matches,
-                          form=form)
+    # Stream the page so the head and sidebar reach the browser before the
+    # message list renders. The session cookie goes out with the headers, so
+    # make sure the CSRF token is stored before streaming starts.
+    generate_csrf()
+    return current_app.response_class(
+        stream_template('messages/conversation.html',
+                        match=match,
+                        other_user=other_user,
+                        messages=messages,
+                        next_cursor=next_cursor,
+                        sidebar=sidebar,
+                        form=form),
+        mimetype='text/html'
+    )
 
 
 @messages_bp.route('/<int:match_id>/send', methods=['POST'])
@@ -136,22 +415,21 @@ def conversation(match_id):
 def send_message(match_id):
     """Send a message - POST endpoint with redirect.
 
-    Rate limited to 30 messages per minute via Flask-Limiter.
+    Rate limited to 30 messages per minute, sharing the per-user token
+    bucket with the AJAX and Socket.IO send paths.
     """
-    # Apply rate limiting if limiter is available
-    if hasattr(current_app, 'limiter') and current_app.limiter:
-        try:
-            # Check rate limit: 30 per minute
-            with current_app.limiter.limit("30 per minute"):
-                pass
-        except Exception:
-            flash('Too many messages. Please wait a moment.', 'warning')
-            return redirect(url_for('messages.conversation', match_id=match_id))
-
-    match = Match.query.get_or_404(match_id)
+    allowed, _ = check_socket_rate_limit(current_user.id)
+    if not allowed:
+        log_security_event('message_rate_limit_exceeded', {
+            'user_id': current_user.id,
+            'match_id': match_id
+        })
+        flash('Too many messages. Please wait a moment.', 'warning')
+        return redirect(url_for('messages.conversation', match_id=match_id))
 
-    # Verify current user is part of this match
-    if match.user1_id != current_user.id and match.user2_id != current_user.id:
+    # Fetch the match only if current user is part of it
+    match = Match.get_for_user(match_id, current_user.id)
+    if not match:
         flash('Invalid conversation.', 'error')
         return redirect(url_for('messages.inbox'))
 
@@ -170,17 +448,18 @@ def send_message(match_id):
                 sender_id=current_user.id,
                 content=content
             )
+            record_socket_message(current_user.id)
 
-            # Emit socket event for real-time update
-            socketio.emit('new_message', {
+            # Queue socket event for real-time update
+            queue_room_emit(match.room, {
                 'match_id': match_id,
                 'message_id': message.id,
                 'sender_id': current_user.id,
                 'sender_name': current_user.display_name,
                 'sender_photo': current_user.primary_photo_url,
                 'content': message.content,
-                'created_at': message.created_at.strftime('%I:%M %p'),
-            }, room=f'match_{match_id}')
+                'created_at': format_message_time(message.created_at),
+            })
 
     # POST-Redirect-GET: Always redirect after POST to prevent duplicate submissions
     return redirect(url_for('messages.conversation', match_id=match_id))
@@ -194,7 +473,7 @@ def send_message_ajax(match_id):
 
     Rate limited to 30 messages per minute.
     """
-    # Check rate limit
+    # Check rate limit (a token is only taken once the message is saved)
     allowed, remaining = check_socket_rate_limit(current_user.id)
     if not allowed:
         log_security_event('message_rate_limit_exceeded', {
@@ -206,10 +485,9 @@ def send_message_ajax(match_id):
             'rate_limited': True
         }), 429
 
-    match = Match.query.get_or_404(match_id)
-
-    # Authorization: Verify current user is part of this match
-    if match.user1_id != current_user.id and match.user2_id != current_user.id:
+    # Authorization: fetch the match only if current user is part of it
+    match = Match.get_for_user(match_id, current_user.id)
+    if not match:
         log_security_event('unauthorized_message_attempt', {
             'match_id': match_id,
             'attempted_by': current_user.id
@@ -219,9 +497,8 @@ def send_message_ajax(match_id):
     if not match.is_active:
         return jsonify({'error': 'Conversation not active'}), 403
 
-    # Check if other user has blocked current user
-    other_user = match.get_other_user(current_user.id)
-    if current_user.is_blocked_by(other_user):
+    # Check if other user has blocked current user (denormalized on the match)
+    if match.is_blocked_for(current_user.id):
         return jsonify({'error': 'Cannot send message'}), 403
 
     # Get and validate content
@@ -243,28 +520,26 @@ def send_message_ajax(match_id):
         sender_id=current_user.id,
         content=sanitized_content
     )
-
-    # Record for rate limiting
     record_socket_message(current_user.id)
 
-    # Emit socket event for real-time update to other user
+    # Queue socket event for real-time update to other user
     # Note: Content is already sanitized, but we escape again for safety
-    socketio.emit('new_message', {
+    queue_room_emit(match.room, {
         'match_id': match_id,
         'message_id': message.id,
         'sender_id': current_user.id,
         'sender_name': current_user.display_name,
         'sender_photo': current_user.primary_photo_url,
         'content': message.content,  # Already sanitized
-        'created_at': message.created_at.strftime('%I:%M %p'),
-    }, room=f'match_{match_id}')
+        'created_at': format_message_time(message.created_at),
+    })
 
     return jsonify({
         'success': True,
         'message': {
             'id': message.id,
             'content': message.content,
-            'created_at': message.created_at.strftime('%I:%M %p'),
+            'created_at': format_message_time(message.created_at),
             'sender_id': current_user.id,
         }
     })
@@ -346,8 +621,8 @@ def on_message(data):
         return
 
     # Verify user is part of match
-    match = Match.query.get(match_id)
-    if not match or (match.user1_id != current_user.id and match.user2_id != current_user.id):
+    match = Match.get_for_user(match_id, current_user.id)
+    if not match:
         log_security_event('unauthorized_socket_message', {
             'match_id': match_id,
             'user_id': current_user.id
@@ -360,9 +635,8 @@ def on_message(data):
         emit('error', {'message': 'Conversation not active'})
         return
 
-    # Check if blocked
-    other_user = match.get_other_user(current_user.id)
-    if current_user.is_blocked_by(other_user):
+    # Check if blocked (denormalized on the match)
+    if match.is_blocked_for(current_user.id):
         emit('error', {'message': 'Cannot send message'})
         return
 
@@ -372,20 +646,18 @@ def on_message(data):
         sender_id=current_user.id,
         content=sanitized_content
     )
-
-    # Record for rate limiting
     record_socket_message(current_user.id)
 
-    # Emit to room
-    emit('new_message', {
+    # Queue for the room (coalesced with other messages in the same window)
+    queue_room_emit(match.room, {
         'match_id': match_id,
         'message_id': message.id,
         'sender_id': current_user.id,
         'sender_name': current_user.display_name,
         'sender_photo': current_user.primary_photo_url,
         'content': message.content,
-        'created_at': message.created_at.strftime('%I:%M %p'),
-    }, room=f'match_{match_id}')
+        'created_at': format_message_time(message.created_at),
+    })
 
 
 @socketio.on('mark_read')
@@ -400,16 +672,13 @@ def on_mark_read(data):
     if not match_id:
         return
 
-    # Verify access before marking
-    if validate_socket_match_access(match_id, current_user.id):
-        Message.mark_conversation_read(match_id, current_user.id)
+    up_to_id = data.get('message_id')
+    if up_to_id is not None and not isinstance(up_to_id, int):
+        return
 
-        # Broadcast read receipt to the room so sender knows their messages were read
-        emit('messages_read', {
-            'match_id': match_id,
-            'read_by': current_user.id,
-            'read_at': datetime.utcnow().strftime('%I:%M %p'),
-        }, room=f'match_{match_id}', include_self=False)
+    # Verify access before marking (applied in batches by the read flusher)
+    if validate_socket_match_access(match_id, current_user.id):
+        queue_mark_read(match_id, current_user.id, up_to_id, request.sid)
 
 
 @socketio.on('typing')
@@ -437,7 +706,7 @@ def on_typing(data):
         'user_id': current_user.id,
         'user_name': current_user.display_name,
         'is_typing': bool(is_typing),
-        'timestamp': datetime.utcnow().isoformat(),
+        'timestamp': utc_now_iso(),
     }, room=f'match_{match_id}', include_self=False)
 
 
@@ -459,5 +728,5 @@ def on_stop_typing(data):
             'user_id': current_user.id,
             'user_name': current_user.display_name,
             'is_typing': False,
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': utc_now_iso(),
         }, room=f'match_{match_id}', include_self=False)
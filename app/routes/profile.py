@@ -1,25 +1,79 @@
 """Profile routes."""
 import os
 import uuid
+from io import BytesIO
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 from app.extensions import db
 from app.models.user import User
 from app.models.profile import Profile
 from app.models.photo import Photo
 from app.forms.profile import ProfileForm, PhotoUploadForm
-from app.utils.image import process_uploaded_image, validate_image_file
-from app.utils.moderation import moderate_profile
-from app.utils.storage import upload_photo_to_storage, delete_photo_from_storage, generate_unique_filename
+from app.utils.image import validate_image_file
+from app.utils.moderation import moderate_profile, flag_user_for_review
+from app.utils.storage import delete_photos_from_storage, generate_content_hash, generate_content_filename
+from app.services.photos import queue_photo_processing
 
 profile_bp = Blueprint('profile', __name__)
 
+def _cm_to_ft_in(height_cm):
+    """Convert cm to the (feet, inches) strings shown in the edit form selects."""
+    total_inches = height_cm / 2.54
+    feet = int(total_inches // 12)
+    inches = int(total_inches % 12)
+    return (str(feet) if 4 <= feet <= 7 else '', str(inches) if 0 <= inches <= 11 else '')
+
+
+# Height conversions precomputed over the form's valid range (ProfileForm.height_cm)
+CM_TO_FTIN = {cm: _cm_to_ft_in(cm) for cm in range(120, 251)}
+FTIN_TO_CM = {(feet, inches): int((feet * 12 + inches) * 2.54)
+              for feet in range(0, 9) for inches in range(0, 12)}
+
+# Profile fields copied 1:1 between ProfileForm and Profile
+_PROFILE_FORM_FIELDS = (
+    'first_name', 'last_name', 'date_of_birth', 'gender',
+    'city', 'state_province', 'country', 'years_in_north_america',
+    'denomination', 'bio', 'has_children',
+    'wants_spouse_same_denomination', 'willing_to_relocate', 'wants_church_wedding',
+)
+# Optional select/text fields where an empty form value is stored as NULL
+_PROFILE_FORM_OPTIONAL_FIELDS = (
+    'romanian_origin_region', 'speaks_romanian',
+    'church_name', 'church_attendance', 'faith_importance',
+    'occupation', 'education',
+    'wants_children', 'smoking', 'drinking',
+    'conservatism_level', 'head_covering', 'fasting_practice', 'prayer_frequency',
+    'bible_reading', 'dietary_restrictions', 'family_role_view',
+    'relationship_goal',
+)
+# Fields only pre-populated on GET; POST derives them (height, gender, age defaults)
+_PROFILE_FORM_GET_ONLY_FIELDS = (
+    'height_cm', 'looking_for_gender', 'looking_for_age_min', 'looking_for_age_max',
+)
+_PROFILE_FORM_POPULATE_FIELDS = (
+    _PROFILE_FORM_FIELDS + _PROFILE_FORM_OPTIONAL_FIELDS + _PROFILE_FORM_GET_ONLY_FIELDS
+)
+
+# Upload limits, resolved from app config once when the blueprint is registered
+_ALLOWED_EXTENSIONS = frozenset()
+_MAX_PHOTOS = 0
+
+
+@profile_bp.record_once
+def _load_upload_config(state):
+    """Capture upload config so hot paths skip the current_app proxy."""
+    global _ALLOWED_EXTENSIONS, _MAX_PHOTOS
+    _ALLOWED_EXTENSIONS = frozenset(state.app.config['ALLOWED_EXTENSIONS'])
+    _MAX_PHOTOS = int(state.app.config['MAX_PHOTOS_PER_USER'])
+
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+           filename.rsplit('.', 1)[1].lower() in _ALLOWED_EXTENSIONS
 
 
 @profile_bp.route('/')
@@ -47,27 +101,10 @@ def edit():
     
     if form.validate_on_submit():
         # Update profile fields
-        profile.first_name = form.first_name.data
-        profile.last_name = form.last_name.data
-        profile.date_of_birth = form.date_of_birth.data
-        profile.gender = form.gender.data
-        
-        profile.city = form.city.data
-        profile.state_province = form.state_province.data
-        profile.country = form.country.data
-        
-        profile.romanian_origin_region = form.romanian_origin_region.data or None
-        profile.speaks_romanian = form.speaks_romanian.data or None
-        profile.years_in_north_america = form.years_in_north_america.data
-        
-        profile.denomination = form.denomination.data
-        profile.church_name = form.church_name.data or None
-        profile.church_attendance = form.church_attendance.data or None
-        profile.faith_importance = form.faith_importance.data or None
-        
-        profile.bio = form.bio.data
-        profile.occupation = form.occupation.data or None
-        profile.education = form.education.data or None
+        for name in _PROFILE_FORM_FIELDS:
+            setattr(profile, name, getattr(form, name).data)
+        for name in _PROFILE_FORM_OPTIONAL_FIELDS:
+            setattr(profile, name, getattr(form, name).data or None)
         
         # Handle height - either from cm or ft/in
         if form.height_cm.data:
@@ -76,25 +113,8 @@ def edit():
             # Convert feet/inches to cm
             feet = int(form.height_ft.data) if form.height_ft.data else 0
             inches = int(form.height_in.data) if form.height_in.data else 0
-            total_inches = (feet * 12) + inches
-            profile.height_cm = int(total_inches * 2.54)
-        
-        profile.has_children = form.has_children.data
-        profile.wants_children = form.wants_children.data or None
-        profile.smoking = form.smoking.data or None
-        profile.drinking = form.drinking.data or None
-        
-        # Traditional/Conservative values
-        profile.conservatism_level = form.conservatism_level.data or None
-        profile.head_covering = form.head_covering.data or None
-        profile.fasting_practice = form.fasting_practice.data or None
-        profile.prayer_frequency = form.prayer_frequency.data or None
-        profile.bible_reading = form.bible_reading.data or None
-        profile.dietary_restrictions = form.dietary_restrictions.data or None
-        profile.family_role_view = form.family_role_view.data or None
-        profile.wants_spouse_same_denomination = form.wants_spouse_same_denomination.data
-        profile.willing_to_relocate = form.willing_to_relocate.data
-        profile.wants_church_wedding = form.wants_church_wedding.data
+            height_cm = FTIN_TO_CM.get((feet, inches))
+            profile.height_cm = height_cm if height_cm is not None else int((feet * 12 + inches) * 2.54)
         
         # Conservative matching: Auto-set looking_for_gender to opposite gender
         # Women see men, men see women
@@ -107,29 +127,29 @@ def edit():
         
         profile.looking_for_age_min = form.looking_for_age_min.data or 18
         profile.looking_for_age_max = form.looking_for_age_max.data or 99
-        profile.relationship_goal = form.relationship_goal.data or None
         
         if not current_user.profile:
             db.session.add(profile)
         
-        db.session.commit()
-        
-        # Run content moderation if enabled
+        # Run content moderation if enabled - it only inspects the field values,
+        # so any review report is saved in the same commit as the profile
         if current_app.config.get('ENABLE_AUTO_MODERATION'):
             mod_result = moderate_profile(profile)
             if mod_result.is_flagged:
                 current_app.logger.warning(
-                    f"Profile {profile.id} flagged: {mod_result.flags}"
+                    f"Profile of user {current_user.id} flagged: {mod_result.flags}"
                 )
                 if mod_result.auto_action == 'flag_for_review':
                     # Create a report for admin review
-                    from app.utils.moderation import flag_user_for_review
                     flag_user_for_review(
                         current_user, 
                         f"Auto-moderation: {len(mod_result.flags)} flags",
-                        mod_result.severity
+                        mod_result.severity,
+                        commit=False
                     )
         
+        db.session.commit()
+        
         flash('Profile updated successfully!', 'success')
         
         # Check if we need to redirect to photo upload
@@ -141,60 +161,14 @@ def edit():
     
     # Pre-populate form for GET request
     elif request.method == 'GET' and current_user.profile:
-        form.first_name.data = profile.first_name
-        form.last_name.data = profile.last_name
-        form.date_of_birth.data = profile.date_of_birth
-        form.gender.data = profile.gender
-        
-        form.city.data = profile.city
-        form.state_province.data = profile.state_province
-        form.country.data = profile.country
-        
-        form.romanian_origin_region.data = profile.romanian_origin_region
-        form.speaks_romanian.data = profile.speaks_romanian
-        form.years_in_north_america.data = profile.years_in_north_america
-        
-        form.denomination.data = profile.denomination
-        form.church_name.data = profile.church_name
-        form.church_attendance.data = profile.church_attendance
-        form.faith_importance.data = profile.faith_importance
-        
-        form.bio.data = profile.bio
-        form.occupation.data = profile.occupation
-        form.education.data = profile.education
-        form.height_cm.data = profile.height_cm
+        for name in _PROFILE_FORM_POPULATE_FIELDS:
+            getattr(form, name).data = getattr(profile, name)
         
         # Also convert height_cm to ft/in for display
         if profile.height_cm:
-            total_inches = profile.height_cm / 2.54
-            feet = int(total_inches // 12)
-            inches = int(total_inches % 12)
-            form.height_ft.data = str(feet) if 4 <= feet <= 7 else ''
-            form.height_in.data = str(inches) if 0 <= inches <= 11 else ''
-        
-        form.has_children.data = profile.has_children
-        form.wants_children.data = profile.wants_children
-        form.smoking.data = profile.smoking
-        form.drinking.data = profile.drinking
-        
-        # Traditional/Conservative values
-        form.conservatism_level.data = profile.conservatism_level
-        form.head_covering.data = profile.head_covering
-        form.fasting_practice.data = profile.fasting_practice
-        form.prayer_frequency.data = profile.prayer_frequency
-        form.bible_reading.data = profile.bible_reading
-        form.dietary_restrictions.data = profile.dietary_restrictions
-        form.family_role_view.data = profile.family_role_view
-        form.wants_spouse_same_denomination.data = profile.wants_spouse_same_denomination
-        form.willing_to_relocate.data = profile.willing_to_relocate
-        form.wants_church_wedding.data = profile.wants_church_wedding
-        form.smoking.data = profile.smoking
-        form.drinking.data = profile.drinking
-        
-        form.looking_for_gender.data = profile.looking_for_gender
-        form.looking_for_age_min.data = profile.looking_for_age_min
-        form.looking_for_age_max.data = profile.looking_for_age_max
-        form.relationship_goal.data = profile.relationship_goal
+            feet, inches = CM_TO_FTIN.get(profile.height_cm) or _cm_to_ft_in(profile.height_cm)
+            form.height_ft.data = feet
+            form.height_in.data = inches
     
     return render_template('profile/edit.html', form=form)
 
@@ -209,66 +183,67 @@ def photos():
         file = form.photo.data
         
         if file and allowed_file(file.filename):
-            # Check photo limit
-            photo_count = Photo.query.filter_by(user_id=current_user.id).count()
-            if photo_count >= current_app.config['MAX_PHOTOS_PER_USER']:
-                flash(f'Maximum {current_app.config["MAX_PHOTOS_PER_USER"]} photos allowed.', 'error')
+            # Failed (or abandoned) uploads stored nothing; drop their rows so they neither
+            # count toward the limit nor block re-uploading the same image (unique hash)
+            failed = [p for p in current_user.photos if p.is_failed]
+            if failed:
+                for failed_photo in failed:
+                    current_user.photos.remove(failed_photo)  # delete-orphan
+                db.session.commit()
+            
+            # Check photo limit (photos are eager-loaded with current_user, no COUNT query)
+            photo_count = len(current_user.photos)
+            if photo_count >= _MAX_PHOTOS:
+                flash(f'Maximum {_MAX_PHOTOS} photos allowed.', 'error')
                 return redirect(url_for('profile.photos'))
             
-            # Validate image file
-            is_valid, error_msg = validate_image_file(file)
+            # Read the upload once; validation and background processing share the bytes
+            raw_bytes = file.stream.read()
+            with BytesIO(raw_bytes) as buf:
+                is_valid, error_msg = validate_image_file(buf)
             if not is_valid:
                 flash(error_msg, 'error')
                 return redirect(url_for('profile.photos'))
             
-            # Generate unique filenames
-            unique_filename = generate_unique_filename(file.filename)
-            thumb_filename = generate_unique_filename(file.filename, prefix='thumb_')
-            
-            # Process image (get bytes, not file path)
-            success, error_msg, image_data = process_uploaded_image(
-                file, 
-                output_path=None,  # Return bytes instead of saving to file
-                create_thumbnail=True
-            )
-            
-            if not success:
-                flash(f'Error processing image: {error_msg}', 'error')
+            # Hash the content so re-uploading the same image is a no-op
+            content_hash = generate_content_hash(raw_bytes)
+            if any(p.content_hash == content_hash for p in current_user.photos):
+                flash('You have already uploaded this photo.', 'info')
                 return redirect(url_for('profile.photos'))
+            upload_id = uuid.uuid4().hex[:8]
+            unique_filename = generate_content_filename(current_user.id, content_hash, upload_id)
+            thumb_filename = generate_content_filename(current_user.id, content_hash, upload_id, prefix='thumb_')
             
-            img_bytes, thumb_bytes = image_data
-            
-            # Upload to Azure Blob Storage (or local fallback)
-            photo_url, storage_type = upload_photo_to_storage(img_bytes, unique_filename)
-            
-            thumbnail_url = None
-            if thumb_bytes:
-                thumbnail_url, _ = upload_photo_to_storage(thumb_bytes, thumb_filename)
-            
-            # Create photo record
-            is_primary = photo_count == 0  # First photo is primary
+            # Create the photo record now; resizing and upload happen in the background
+            is_primary = not any(p.is_primary for p in current_user.photos)  # First photo is primary
             
             photo = Photo(
                 user_id=current_user.id,
                 filename=unique_filename,
-                url=photo_url,
-                thumbnail_url=thumbnail_url,
+                url=Photo.PLACEHOLDER_URL,
+                processing_status='processing',
+                content_hash=content_hash,
                 is_primary=is_primary,
                 display_order=photo_count
             )
             db.session.add(photo)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Same image uploaded concurrently from another request
+                db.session.rollback()
+                flash('You have already uploaded this photo.', 'info')
+                return redirect(url_for('profile.photos'))
             
-            storage_msg = "Azure Blob" if storage_type == 'azure' else "local"
-            current_app.logger.info(f"Photo uploaded to {storage_msg}: {unique_filename}")
+            queue_photo_processing(photo, raw_bytes, unique_filename, thumb_filename)
             
-            flash('Photo uploaded and optimized!', 'success')
+            flash('Photo uploaded! It will appear once processing finishes.', 'success')
             return redirect(url_for('profile.photos'))
         else:
             flash('Invalid file type. Please upload an image.', 'error')
     
-    user_photos = Photo.query.filter_by(user_id=current_user.id).order_by(Photo.display_order).all()
-    return render_template('profile/photos.html', form=form, photos=user_photos)
+    # Already loaded with current_user, ordered by display_order
+    return render_template('profile/photos.html', form=form, photos=current_user.photos)
 
 
 @profile_bp.route('/photos/<int:photo_id>/delete', methods=['POST'])
@@ -277,24 +252,27 @@ def delete_photo(photo_id):
     """Delete a photo."""
     photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first_or_404()
     
-    # Delete file from storage (Azure Blob or local)
-    try:
-        delete_photo_from_storage(photo.url)
-        if photo.thumbnail_url:
-            delete_photo_from_storage(photo.thumbnail_url)
-    except Exception as e:
-        current_app.logger.warning(f"Failed to delete photo file: {e}")
+    # Delete file from storage (Azure Blob or local); unprocessed photos have none yet
+    # Image and thumbnail are deleted concurrently; failures are logged
+    delete_photos_from_storage([
+        photo.url if photo.url != Photo.PLACEHOLDER_URL else None,
+        photo.thumbnail_url,
+    ])
     
     was_primary = photo.is_primary
     db.session.delete(photo)
-    db.session.commit()
     
-    # If deleted photo was primary, make another one primary
+    # If deleted photo was primary, promote the next one in the same transaction
     if was_primary:
-        next_photo = Photo.query.filter_by(user_id=current_user.id).order_by(Photo.display_order).first()
-        if next_photo:
-            next_photo.is_primary = True
-            db.session.commit()
+        db.session.flush()
+        next_photo_id = select(Photo.id).where(
+            Photo.user_id == current_user.id
+        ).order_by(Photo.display_order).limit(1).scalar_subquery()
+        db.session.execute(
+            update(Photo).where(Photo.id == next_photo_id).values(is_primary=True)
+        )
+    
+    db.session.commit()
     
     flash('Photo deleted.', 'success')
     return redirect(url_for('profile.photos'))
@@ -323,14 +301,14 @@ def view_user(user_id):
         flash('This profile is not available.', 'error')
         return redirect(url_for('discover.browse'))
 
-    # Check if blocked
-    if current_user.has_blocked(user) or current_user.is_blocked_by(user):
+    # Block, match and like state in one (cached) lookup
+    relationship = current_user.get_relationship(user)
+    if relationship['has_blocked'] or relationship['is_blocked_by']:
         flash('This profile is not available.', 'error')
         return redirect(url_for('discover.browse'))
 
-    # Check if matched
-    is_matched = current_user.is_matched_with(user)
-    has_liked = current_user.has_liked(user)
+    is_matched = relationship['is_matched']
+    has_liked = relationship['has_liked']
 
     # Privacy settings - only show what user allows
     privacy_context = {
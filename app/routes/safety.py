@@ -1,6 +1,7 @@
 """Safety routes for reporting and blocking users."""
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import load_only
 from app.extensions import db
 from app.models.user import User
 from app.models.report import Report, Block
@@ -20,6 +21,12 @@ REPORT_REASONS = [
     ('impersonation', 'Impersonating Someone'),
     ('other', 'Other'),
 ]
+_REPORT_REASON_IDS = frozenset(r[0] for r in REPORT_REASONS)
+
+
+def _user_exists(user_id):
+    """Cheap existence probe that selects only the primary key."""
+    return db.session.query(User.id).filter_by(id=user_id, is_active=True).scalar() is not None
 
 
 @safety_bp.route('/report/<int:user_id>', methods=['GET', 'POST'])
@@ -33,13 +40,7 @@ def report_user(user_id):
     reported_user = User.query.get_or_404(user_id)
     
     # Check if already reported recently
-    existing_report = Report.query.filter_by(
-        reporter_id=current_user.id,
-        reported_id=user_id,
-        status='pending'
-    ).first()
-    
-    if existing_report:
+    if Report.has_pending_report(current_user.id, user_id):
         flash("You have already reported this user. We're reviewing it.", "info")
         return redirect(url_for('profile.view_user', user_id=user_id))
     
@@ -47,7 +48,7 @@ def report_user(user_id):
         reason = request.form.get('reason')
         description = request.form.get('description', '').strip()
         
-        if not reason or reason not in [r[0] for r in REPORT_REASONS]:
+        if not reason or reason not in _REPORT_REASON_IDS:
             flash("Please select a valid reason.", "error")
             return render_template('safety/report.html', 
                                    user=reported_user, 
@@ -87,21 +88,23 @@ def block_user(user_id):
         flash("You cannot block yourself.", "error")
         return redirect(url_for('main.dashboard'))
     
+    # AJAX callers only need a status, so skip loading the full user row
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if not _user_exists(user_id):
+            return jsonify({'error': 'User not found'}), 404
+        Block.block_user(current_user.id, user_id)
+        return jsonify({'status': 'blocked'})
+    
     blocked_user = User.query.get_or_404(user_id)
     
     # Check if already blocked
     if current_user.has_blocked(blocked_user):
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return jsonify({'status': 'already_blocked'})
         flash(f"{blocked_user.display_name} is already blocked.", "info")
         return redirect(request.referrer or url_for('discover.browse'))
     
     # Block the user
     Block.block_user(current_user.id, user_id)
     
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return jsonify({'status': 'blocked', 'message': f'{blocked_user.display_name} has been blocked'})
-    
     flash(f"{blocked_user.display_name} has been blocked. You won't see each other anymore.", "success")
     return redirect(url_for('discover.browse'))
 
@@ -110,19 +113,21 @@ def block_user(user_id):
 @login_required
 def unblock_user(user_id):
     """Unblock a user."""
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if not _user_exists(user_id):
+            return jsonify({'error': 'User not found'}), 404
+        if not Block.unblock_user(current_user.id, user_id):
+            return jsonify({'error': 'User is not blocked'}), 400
+        return jsonify({'status': 'unblocked'})
+    
     blocked_user = User.query.get_or_404(user_id)
     
     if not current_user.has_blocked(blocked_user):
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return jsonify({'error': 'User is not blocked'}), 400
         flash(f"{blocked_user.display_name} is not blocked.", "info")
         return redirect(request.referrer or url_for('settings.blocked_users'))
     
     Block.unblock_user(current_user.id, user_id)
     
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return jsonify({'status': 'unblocked', 'message': f'{blocked_user.display_name} has been unblocked'})
-    
     flash(f"{blocked_user.display_name} has been unblocked.", "success")
     return redirect(request.referrer or url_for('settings.blocked_users'))
 
@@ -131,8 +136,13 @@ def unblock_user(user_id):
 @login_required
 def blocked_users():
     """View list of blocked users."""
-    blocked_ids = Block.get_blocked_ids(current_user.id)
-    blocked = User.query.filter(User.id.in_(blocked_ids)).all() if blocked_ids else []
+    # One JOIN instead of fetching ids then users; the template only needs
+    # display_name and the avatar (profile and photos are joined-loaded)
+    blocked = User.query.options(load_only(User.id, User.email)).join(
+        Block, Block.blocked_id == User.id
+    ).filter(
+        Block.blocker_id == current_user.id
+    ).order_by(Block.created_at.desc()).all()
     
     return render_template('safety/blocked.html', blocked_users=blocked)
 
@@ -1,15 +1,71 @@
 """Settings routes."""
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from datetime import datetime
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, current_app,
+                   Response, stream_with_context)
 from flask_login import login_required, current_user, logout_user
-from app.extensions import db
-from app.models.report import Block
+from sqlalchemy import case, update
+from sqlalchemy.orm import load_only
+from app.extensions import db, get_redis
+from app.models.user import User
+from app.models.profile import Profile
+from app.models.photo import Photo
+from app.models.match import Match, Like
+from app.models.message import Message
+from app.models.report import Block, Report
 from app.forms.auth import ChangePasswordForm, ChangeEmailForm
 from app.forms.profile import PreferencesForm
-from app.services.email import send_email
+from app.services.email import send_verification_email
+from app.services.photos import queue_photo_deletion
 import secrets
+import time
+
+# orjson (optional) serializes the data export several times faster.
+# Both variants return UTF-8 bytes, which the streamed response writes as-is
+try:
+    import orjson
+
+    def _json_dumps(value):
+        return orjson.dumps(value)
+except ImportError:
+    import json
+
+    def _json_dumps(value):
+        # ASCII-only output (\uXXXX escapes), so encoding is a plain copy
+        return json.dumps(value).encode()
 
 settings_bp = Blueprint('settings', __name__)
 
+# Minimum gap between verification email resends for one user
+VERIFY_RESEND_COOLDOWN = 60  # seconds
+
+# Local cooldown fallback when Redis is not configured (per worker)
+# Structure: {user_id: monotonic time when the cooldown ends}
+_verify_resend_until = {}
+
+
+def _claim_verify_resend(user_id):
+    """Claim the user's verification resend slot for VERIFY_RESEND_COOLDOWN.
+
+    Returns:
+        bool: True if a new email may be sent, False if one went out recently
+    """
+    redis_client = get_redis()
+    if redis_client is not None:
+        try:
+            return bool(redis_client.set(f'verify_rl:{user_id}', 1,
+                                         nx=True, ex=VERIFY_RESEND_COOLDOWN))
+        except Exception as e:
+            current_app.logger.warning(f"Redis verify cooldown failed, using local: {e}")
+    
+    now = time.monotonic()
+    if _verify_resend_until.get(user_id, 0) > now:
+        return False
+    # Drop expired entries so the dict stays bounded
+    for uid in [u for u, until in _verify_resend_until.items() if until <= now]:
+        del _verify_resend_until[uid]
+    _verify_resend_until[user_id] = now + VERIFY_RESEND_COOLDOWN
+    return True
+
 
 @settings_bp.route('/')
 @login_required
@@ -57,17 +113,21 @@ def preferences():
     profile = current_user.profile
     
     if form.validate_on_submit():
+        values = {
+            'looking_for_age_min': form.looking_for_age_min.data,
+            'looking_for_age_max': form.looking_for_age_max.data,
+            'relationship_goal': form.relationship_goal.data or None,
+        }
+        
         # looking_for_gender is auto-set based on user's gender (opposite sex only)
         # Conservative Christian platform - women see men, men see women
         if profile.gender == 'female':
-            profile.looking_for_gender = 'male'
+            values['looking_for_gender'] = 'male'
         elif profile.gender == 'male':
-            profile.looking_for_gender = 'female'
-        
-        profile.looking_for_age_min = form.looking_for_age_min.data
-        profile.looking_for_age_max = form.looking_for_age_max.data
-        profile.relationship_goal = form.relationship_goal.data or None
+            values['looking_for_gender'] = 'female'
         
+        # Core UPDATE of just these columns - no ORM flush of the loaded profile
+        db.session.execute(update(Profile).where(Profile.id == profile.id).values(**values))
         db.session.commit()
         flash('Preferences updated.', 'success')
         return redirect(url_for('settings.preferences'))
@@ -84,17 +144,19 @@ def preferences():
 @login_required
 def blocked():
     """View blocked users."""
-    blocked_users = []
-    blocks = Block.query.filter_by(blocker_id=current_user.id).all()
+    # Single JOIN instead of one User lookup per block
+    rows = db.session.query(Block.created_at, User).join(
+        User, User.id == Block.blocked_id
+    ).options(
+        load_only(User.id, User.email)
+    ).filter(
+        Block.blocker_id == current_user.id
+    ).order_by(Block.created_at.desc()).all()
     
-    for block in blocks:
-        from app.models.user import User
-        user = User.query.get(block.blocked_id)
-        if user:
-            blocked_users.append({
-                'user': user,
-                'blocked_at': block.created_at
-            })
+    blocked_users = [
+        {'user': user, 'blocked_at': blocked_at}
+        for blocked_at, user in rows
+    ]
     
     return render_template('settings/blocked.html', blocked_users=blocked_users)
 
@@ -115,62 +177,21 @@ def delete_account():
         confirm_text = request.form.get('confirm_text', '')
 
         if not current_user.check_password(password):
-            flash('Incorrect password.', 'error')
-            return render_template('settings/delete_account.html')
+            return _delete_account_error('Incorrect password.')
 
         if confirm_text.lower() != 'delete my account':
-            flash('Please type "delete my account" to confirm.', 'error')
-            return render_template('settings/delete_account.html')
+            return _delete_account_error('Please type "delete my account" to confirm.')
 
         # Store user info before deletion for logging
         user_id = current_user.id
         user_email = current_user.email
 
         try:
-            # Delete photos from cloud storage
-            from app.utils.storage import delete_photo_from_storage
-            from app.models.photo import Photo
-
-            user_photos = Photo.query.filter_by(user_id=user_id).all()
-            for photo in user_photos:
-                try:
-                    delete_photo_from_storage(photo.url)
-                    if photo.thumbnail_url:
-                        delete_photo_from_storage(photo.thumbnail_url)
-                except Exception as e:
-                    current_app.logger.warning(f"Failed to delete photo from storage: {e}")
-
-            # Delete all related data (cascade should handle most, but be explicit)
-            from app.models.match import Match, Like
-            from app.models.message import Message
-            from app.models.report import Report
-
-            # Delete messages where user is sender
-            Message.query.filter_by(sender_id=user_id).delete()
-
-            # Delete likes made by user
-            Like.query.filter_by(liker_id=user_id).delete()
-            Like.query.filter_by(liked_id=user_id).delete()
-
-            # Deactivate matches (don't delete - other user's data)
-            matches = Match.query.filter(
-                (Match.user1_id == user_id) | (Match.user2_id == user_id)
-            ).all()
-            for match in matches:
-                match.is_active = False
-
-            # Delete reports made by user (keep reports about user for safety)
-            Report.query.filter_by(reporter_id=user_id).delete()
-
-            # Delete blocks made by and against user
-            Block.query.filter_by(blocker_id=user_id).delete()
-            Block.query.filter_by(blocked_id=user_id).delete()
-
-            # Now delete the user (cascades to profile and photos)
-            from app.models.user import User
-            user = User.query.get(user_id)
-            db.session.delete(user)
+            # Database first, in one short transaction; storage deletes are
+            # slow network calls, so they run after commit in the background
+            photo_urls = _purge_user_data(user_id)
             db.session.commit()
+            queue_photo_deletion(photo_urls)
 
             current_app.logger.info(f"User account deleted: {user_email} (ID: {user_id})")
 
@@ -181,108 +202,208 @@ def delete_account():
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Error deleting user account: {e}")
-            flash('An error occurred while deleting your account. Please try again.', 'error')
-            return render_template('settings/delete_account.html')
+            return _delete_account_error('An error occurred while deleting your account. Please try again.')
+
+    return render_template('settings/delete_account.html')
+
 
+def _delete_account_error(message):
+    """Re-render the delete account page with an error."""
+    flash(message, 'error')
     return render_template('settings/delete_account.html')
 
 
+def _purge_user_data(user_id):
+    """Delete or detach all of a user's rows (caller commits).
+
+    Returns:
+        list: Stored photo/thumbnail URLs to remove from storage after commit
+    """
+    # Only the URLs are needed, so don't hydrate Photo objects
+    photo_urls = [
+        url
+        for row in db.session.query(Photo.url, Photo.thumbnail_url).filter_by(user_id=user_id)
+        for url in row
+        if url and url != Photo.PLACEHOLDER_URL
+    ]
+
+    # Delete all related data (cascade should handle most, but be explicit).
+    # Bulk statements skip session sync - none of these rows are loaded here
+
+    # Delete messages where user is sender
+    Message.query.filter_by(sender_id=user_id).delete(synchronize_session=False)
+
+    # Delete likes made by user
+    Like.query.filter_by(liker_id=user_id).delete(synchronize_session=False)
+    Like.query.filter_by(liked_id=user_id).delete(synchronize_session=False)
+
+    # Deactivate matches (don't delete - other user's data) in one UPDATE
+    user_matches = Match.query.filter(
+        (Match.user1_id == user_id) | (Match.user2_id == user_id)
+    )
+    for user1_id, user2_id in user_matches.with_entities(Match.user1_id, Match.user2_id):
+        Match.invalidate_sidebar_cache(user1_id, user2_id)
+    user_matches.update({Match.is_active: False}, synchronize_session=False)
+
+    # Delete reports made by user (keep reports about user for safety)
+    Report.query.filter_by(reporter_id=user_id).delete(synchronize_session=False)
+
+    # Delete blocks made by and against user
+    Block.query.filter_by(blocker_id=user_id).delete(synchronize_session=False)
+    Block.query.filter_by(blocked_id=user_id).delete(synchronize_session=False)
+
+    # Now delete the user (cascades to profile and photos)
+    db.session.delete(db.session.get(User, user_id))
+
+    return photo_urls
+
+
 @settings_bp.route('/export-data')
 @login_required
 def export_data():
-    """Export all user data (GDPR data portability)."""
-    import json
-    from datetime import datetime
-    from flask import Response
-    from app.models.match import Match, Like
-    from app.models.message import Message
-
-    user_data = {
-        'exported_at': datetime.utcnow().isoformat(),
-        'account': {
-            'email': current_user.email,
-            'created_at': current_user.created_at.isoformat() if current_user.created_at else None,
-            'is_verified': current_user.is_verified,
-            'is_premium': current_user.is_premium,
-            'last_login': current_user.last_login.isoformat() if current_user.last_login else None,
-        },
-        'profile': {},
-        'photos': [],
-        'matches': [],
-        'messages_sent': [],
-        'likes_sent': [],
-    }
-
-    # Profile data
-    if current_user.profile:
-        p = current_user.profile
-        user_data['profile'] = {
-            'first_name': p.first_name,
-            'last_name': p.last_name,
-            'date_of_birth': p.date_of_birth.isoformat() if p.date_of_birth else None,
-            'gender': p.gender,
-            'city': p.city,
-            'state_province': p.state_province,
-            'country': p.country,
-            'bio': p.bio,
-            'denomination': p.denomination,
-            'occupation': p.occupation,
-            'education': p.education,
+    """Export all user data (GDPR data portability).
+
+    Streamed as it is serialized, so memory stays flat and the download
+    starts before the message and like history has been read.
+    """
+    user = current_user._get_current_object()
+    user_id = user.id
+
+    def display_name(email, first_name):
+        # Same fallback as User.display_name; no user row means deleted
+        if email is None:
+            return 'Deleted User'
+        return first_name or email.split('@')[0]
+
+    def match_rows(matches):
+        for matched_at, is_active, email, first_name in matches:
+            yield {
+                'matched_with': display_name(email, first_name),
+                'matched_at': matched_at.isoformat() if matched_at else None,
+                'is_active': is_active,
+            }
+
+    def like_rows(likes):
+        for created_at, is_super_like, email, first_name in likes:
+            yield {
+                'liked_user': display_name(email, first_name),
+                'created_at': created_at.isoformat() if created_at else None,
+                'is_super_like': is_super_like,
+            }
+
+    def generate():
+        account = {
+            'email': user.email,
+            'created_at': user.created_at.isoformat() if user.created_at else None,
+            'is_verified': user.is_verified,
+            'is_premium': user.is_premium,
+            'last_login': user.last_login.isoformat() if user.last_login else None,
         }
 
-    # Photos (URLs only)
-    for photo in current_user.photos:
-        user_data['photos'].append({
+        # Profile data
+        profile = {}
+        if user.profile:
+            p = user.profile
+            profile = {
+                'first_name': p.first_name,
+                'last_name': p.last_name,
+                'date_of_birth': p.date_of_birth.isoformat() if p.date_of_birth else None,
+                'gender': p.gender,
+                'city': p.city,
+                'state_province': p.state_province,
+                'country': p.country,
+                'bio': p.bio,
+                'denomination': p.denomination,
+                'occupation': p.occupation,
+                'education': p.education,
+            }
+
+        # Photos (URLs only)
+        photos = [{
             'filename': photo.filename,
             'is_primary': photo.is_primary,
             'created_at': photo.created_at.isoformat() if photo.created_at else None,
-        })
-
-    # Matches
-    matches = Match.query.filter(
-        (Match.user1_id == current_user.id) | (Match.user2_id == current_user.id)
-    ).all()
-    for match in matches:
-        other_user = match.get_other_user(current_user.id)
-        user_data['matches'].append({
-            'matched_with': other_user.display_name if other_user else 'Deleted User',
-            'matched_at': match.matched_at.isoformat() if match.matched_at else None,
-            'is_active': match.is_active,
-        })
-
-    # Messages sent
-    messages = Message.query.filter_by(sender_id=current_user.id).order_by(Message.created_at).all()
-    for msg in messages:
-        user_data['messages_sent'].append({
-            'content': msg.content,
-            'created_at': msg.created_at.isoformat() if msg.created_at else None,
-        })
-
-    # Likes sent
-    likes = Like.query.filter_by(liker_id=current_user.id).all()
-    for like in likes:
-        from app.models.user import User
-        liked_user = User.query.get(like.liked_id)
-        user_data['likes_sent'].append({
-            'liked_user': liked_user.display_name if liked_user else 'Deleted User',
-            'created_at': like.created_at.isoformat() if like.created_at else None,
-            'is_super_like': like.is_super_like,
-        })
+        } for photo in user.photos]
+
+        yield (b'{"exported_at": ' + _json_dumps(datetime.utcnow().isoformat())
+               + b', "account": ' + _json_dumps(account)
+               + b', "profile": ' + _json_dumps(profile)
+               + b', "photos": ' + _json_dumps(photos))
+
+        # Matches
+        # Only the exported columns, with the other user's name joined in
+        other_user_id = case((Match.user1_id == user_id, Match.user2_id), else_=Match.user1_id)
+        matches = db.session.query(
+            Match.matched_at, Match.is_active, User.email, Profile.first_name
+        ).outerjoin(
+            User, User.id == other_user_id
+        ).outerjoin(
+            Profile, Profile.user_id == User.id
+        ).filter(
+            (Match.user1_id == user_id) | (Match.user2_id == user_id)
+        ).yield_per(500)
+        yield b', "matches": '
+        yield from _stream_json_array(match_rows(matches))
+
+        # Messages sent
+        messages = db.session.query(Message.content, Message.created_at).filter(
+            Message.sender_id == user_id
+        ).order_by(Message.created_at).yield_per(1000)
+        yield b', "messages_sent": '
+        yield from _stream_json_array({
+            'content': content,
+            'created_at': created_at.isoformat() if created_at else None,
+        } for content, created_at in messages)
+
+        # Likes sent
+        # One outer join for the liked user's name instead of a lookup per like
+        likes = db.session.query(
+            Like.created_at, Like.is_super_like, User.email, Profile.first_name
+        ).outerjoin(
+            User, User.id == Like.liked_id
+        ).outerjoin(
+            Profile, Profile.user_id == User.id
+        ).filter(
+            Like.liker_id == user_id
+        ).yield_per(500)
+        yield b', "likes_sent": '
+        yield from _stream_json_array(like_rows(likes))
+
+        yield b'}'
 
     # Return as downloadable JSON
-    response = Response(
-        json.dumps(user_data, indent=2, ensure_ascii=False),
+    return Response(
+        stream_with_context(generate()),
         mimetype='application/json',
         headers={'Content-Disposition': f'attachment; filename=my_data_{datetime.utcnow().strftime("%Y%m%d")}.json'}
     )
-    return response
+
+
+def _stream_json_array(items, batch_size=200):
+    """Serialize an iterable of dicts as a JSON array, yielding in batches.
+
+    Batching keeps the number of chunks written to the socket low while
+    never holding more than batch_size serialized items in memory.
+    """
+    yield b'['
+    batch = []
+    first = True
+    for item in items:
+        batch.append(_json_dumps(item))
+        if len(batch) >= batch_size:
+            yield (b'' if first else b', ') + b', '.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield (b'' if first else b', ') + b', '.join(batch)
+    yield b']'
 
 
 @settings_bp.route('/deactivate', methods=['POST'])
 @login_required
 def deactivate():
     """Temporarily deactivate account."""
-    current_user.is_active = False
+    db.session.execute(update(User).where(User.id == current_user.id).values(is_active=False))
     db.session.commit()
     
     logout_user()
@@ -307,7 +428,6 @@ def change_email():
             return render_template('settings/change_email.html')
         
         # Check if email is already taken
-        from app.models.user import User
         existing = User.query.filter_by(email=new_email).first()
         if existing and existing.id != current_user.id:
             flash('This email is already in use.', 'error')
@@ -319,18 +439,11 @@ def change_email():
         current_user.verification_token = secrets.token_urlsafe(32)
         db.session.commit()
         
-        # Send verification email
+        # Send verification email (queued on a background thread)
         try:
-            from flask import current_app
-            verify_url = url_for('auth.verify_email', token=current_user.verification_token, _external=True)
-            send_email(
-                to=new_email,
-                subject=f'Verify Your New Email - {current_app.config["APP_NAME"]}',
-                template='emails/verify_email.html',
-                verify_url=verify_url
-            )
-        except Exception as e:
-            print(f"Email send error: {e}")
+            send_verification_email(current_user)
+        except Exception:
+            current_app.logger.exception("Failed to queue verification email")
         
         flash('Email updated! Please check your new email for verification.', 'success')
         return redirect(url_for('settings.index'))
@@ -346,22 +459,20 @@ def verify_account():
         flash('Your account is already verified.', 'info')
         return redirect(url_for('settings.index'))
     
+    # Debounce so repeated clicks don't each cost a commit and an email
+    if not _claim_verify_resend(current_user.id):
+        flash('A verification email was sent recently. Please check your inbox.', 'info')
+        return redirect(url_for('settings.index'))
+    
     # Generate new token
     current_user.verification_token = secrets.token_urlsafe(32)
     db.session.commit()
     
-    try:
-        from flask import current_app
-        verify_url = url_for('auth.verify_email', token=current_user.verification_token, _external=True)
-        send_email(
-            to=current_user.email,
-            subject=f'Verify Your Email - {current_app.config["APP_NAME"]}',
-            template='emails/verify_email.html',
-            verify_url=verify_url
-        )
+    # Queued on a background thread, so the request doesn't wait on SMTP
+    if send_verification_email(current_user):
         flash('Verification email sent! Check your inbox.', 'success')
-    except Exception as e:
-        print(f"Email send error: {e}")
+    else:
+        current_app.logger.error(f"Failed to queue verification email for user {current_user.id}")
         flash('Could not send verification email. Please try again later.', 'error')
     
     return redirect(url_for('settings.index'))
@@ -371,8 +482,10 @@ def verify_account():
 @login_required
 def update_privacy():
     """Update privacy settings."""
-    current_user.show_online = 'show_online' in request.form
-    current_user.show_distance = 'show_distance' in request.form
+    db.session.execute(update(User).where(User.id == current_user.id).values(
+        show_online='show_online' in request.form,
+        show_distance='show_distance' in request.form,
+    ))
     db.session.commit()
     
     flash('Privacy settings updated.', 'success')
@@ -383,8 +496,10 @@ def update_privacy():
 @login_required
 def update_notifications():
     """Update notification settings."""
-    current_user.notify_matches = 'notify_matches' in request.form
-    current_user.notify_messages = 'notify_messages' in request.form
+    db.session.execute(update(User).where(User.id == current_user.id).values(
+        notify_matches='notify_matches' in request.form,
+        notify_messages='notify_messages' in request.form,
+    ))
     db.session.commit()
     
     flash('Notification settings updated.', 'success')
@@ -396,10 +511,11 @@ def update_notifications():
 def pause_account():
     """Pause/unpause account (hide from search)."""
     if request.method == 'POST':
-        current_user.is_paused = not current_user.is_paused
+        is_paused = not current_user.is_paused
+        db.session.execute(update(User).where(User.id == current_user.id).values(is_paused=is_paused))
         db.session.commit()
         
-        if current_user.is_paused:
+        if is_paused:
             flash('Your account is now paused. You won\'t appear in searches.', 'info')
         else:
             flash('Your account is now active again!', 'success')
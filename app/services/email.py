@@ -2,16 +2,133 @@
 from flask import current_app, render_template, url_for
 from flask_mail import Message
 from app.extensions import mail
-from threading import Thread
+from threading import Lock, Thread
+import queue
+import time
+
+# Retries for transient SMTP failures (runs in the background thread)
+EMAIL_MAX_RETRIES = 3
+EMAIL_RETRY_BACKOFF = 2  # seconds, doubled after each attempt
+
+# Outgoing mail is handed to a small pool of long-lived worker threads
+# instead of spawning a thread per email; the bounded queue applies
+# back-pressure during bursts (e.g. match notification fan-out)
+EMAIL_QUEUE_SIZE = 10000
+EMAIL_WORKER_COUNT = 2
+
+EMAIL_BATCH_SIZE = 64  # max messages sent over one SMTP connection
+
+# Subject prefix and sender, resolved from app config once by init_email()
+_SUBJECT_PREFIX = 'Două Inimi - '
+_SENDER = 'noreply@douainimi.com'
+
+_email_queue = queue.Queue(maxsize=EMAIL_QUEUE_SIZE)
+_email_workers_started = False
+_email_workers_lock = Lock()
+
+
+def init_email(app):
+    """Cache per-send config (APP_NAME, MAIL_DEFAULT_SENDER) at startup."""
+    global _SUBJECT_PREFIX, _SENDER
+    _SUBJECT_PREFIX = f"{app.config.get('APP_NAME', 'Două Inimi')} - "
+    _SENDER = app.config.get('MAIL_DEFAULT_SENDER', 'noreply@douainimi.com')
 
 
 def send_async_email(app, msg):
-    """Send email asynchronously."""
+    """Send email asynchronously, retrying transient failures with backoff."""
+    with app.app_context():
+        delay = EMAIL_RETRY_BACKOFF
+        for attempt in range(1, EMAIL_MAX_RETRIES + 1):
+            try:
+                mail.send(msg)
+                return
+            except Exception as e:
+                if attempt == EMAIL_MAX_RETRIES:
+                    current_app.logger.error(f"Failed to send email after {attempt} attempts: {e}")
+                    return
+                current_app.logger.warning(f"Email send attempt {attempt} failed, retrying: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+
+def send_many(app, messages):
+    """Send several emails over a single SMTP connection.
+
+    Saves a TCP/TLS handshake and login per message. If the connection
+    fails part way, the unsent messages fall back to send_async_email
+    (one connection each, with retries).
+    """
+    sent = 0
     with app.app_context():
         try:
-            mail.send(msg)
+            with mail.connect() as conn:
+                for msg in messages:
+                    conn.send(msg)
+                    sent += 1
+            return
         except Exception as e:
-            current_app.logger.error(f"Failed to send email: {e}")
+            current_app.logger.warning(
+                f"Batch email send failed after {sent}/{len(messages)}, retrying individually: {e}"
+            )
+    for msg in messages[sent:]:
+        send_async_email(app, msg)
+
+
+def _email_worker():
+    """Send queued emails forever (daemon thread).
+
+    Drains whatever is already queued (up to EMAIL_BATCH_SIZE) so a burst
+    of notifications shares one SMTP connection.
+    """
+    while True:
+        batch = [_email_queue.get()]
+        while len(batch) < EMAIL_BATCH_SIZE:
+            try:
+                batch.append(_email_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if len(batch) == 1:
+                send_async_email(*batch[0])
+            else:
+                # Messages are grouped per app (one app per process in practice)
+                by_app = {}
+                for app, msg in batch:
+                    by_app.setdefault(app, []).append(msg)
+                for app, messages in by_app.items():
+                    send_many(app, messages)
+        except Exception:
+            pass  # failures are logged by the senders; keep the worker alive
+        finally:
+            for _ in batch:
+                _email_queue.task_done()
+
+
+def _start_email_workers():
+    """Start the worker pool on first use."""
+    global _email_workers_started
+    with _email_workers_lock:
+        if _email_workers_started:
+            return
+        for i in range(EMAIL_WORKER_COUNT):
+            Thread(target=_email_worker, name=f'email-worker-{i}', daemon=True).start()
+        _email_workers_started = True
+
+
+def queue_email(app, msg):
+    """Hand a message to the background email workers.
+
+    Returns:
+        bool: False if the queue is full and the email was dropped
+    """
+    if not _email_workers_started:
+        _start_email_workers()
+    try:
+        _email_queue.put_nowait((app, msg))
+        return True
+    except queue.Full:
+        app.logger.error(f"Email queue full, dropping email to {msg.recipients}")
+        return False
 
 
 def send_email(subject, recipient, template, **kwargs):
@@ -27,9 +144,9 @@ def send_email(subject, recipient, template, **kwargs):
     app = current_app._get_current_object()
     
     msg = Message(
-        subject=f"{current_app.config.get('APP_NAME', 'Două Inimi')} - {subject}",
+        subject=_SUBJECT_PREFIX + subject,
         recipients=[recipient],
-        sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@douainimi.com')
+        sender=_SENDER
     )
     
     # Render HTML and plain text versions
@@ -50,13 +167,7 @@ def send_email(subject, recipient, template, **kwargs):
         current_app.logger.info(f"[EMAIL] To: {recipient}, Subject: {subject}")
         return True
     
-    try:
-        thread = Thread(target=send_async_email, args=[app, msg])
-        thread.start()
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {e}")
-        return False
+    return queue_email(app, msg)
 
 
 def send_verification_email(user):
@@ -134,7 +245,7 @@ def send_email_direct(subject, recipients, html_body, text_body=None):
     msg = Message(
         subject=subject,
         recipients=recipients,
-        sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@douainimi.com')
+        sender=_SENDER
     )
 
     msg.html = html_body
@@ -145,11 +256,5 @@ def send_email_direct(subject, recipients, html_body, text_body=None):
         current_app.logger.info(f"[EMAIL] To: {recipients}, Subject: {subject}")
         return True
 
-    try:
-        thread = Thread(target=send_async_email, args=[app, msg])
-        thread.start()
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {e}")
-        return False
+    return queue_email(app, msg)
 
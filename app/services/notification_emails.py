@@ -1,5 +1,6 @@
 """Email notification service for matches, messages, etc."""
-from flask import current_app, render_template_string
+from flask import current_app
+from jinja2 import Environment, select_autoescape
 from app.services.email import send_email_direct
 
 
@@ -131,6 +132,16 @@ SUPER_LIKE_TEMPLATE = """
 """
 
 
+# The templates only use the values passed in, so they are compiled once
+# at import in a standalone environment (autoescaped like Flask's)
+_email_env = Environment(autoescape=select_autoescape(['html'], default_for_string=True))
+_TEMPLATES = {
+    'match': _email_env.from_string(NEW_MATCH_TEMPLATE),
+    'message': _email_env.from_string(NEW_MESSAGE_TEMPLATE),
+    'super_like': _email_env.from_string(SUPER_LIKE_TEMPLATE),
+}
+
+
 class EmailNotificationService:
     """Service for sending email notifications."""
     
@@ -142,20 +153,21 @@ class EmailNotificationService:
     @staticmethod
     def send_new_match_email(recipient, match_user, match):
         """Send email notification for a new match."""
+        # Resolve once; display_name is used three times below
+        match_name = match_user.display_name
         try:
-            html = render_template_string(
-                NEW_MATCH_TEMPLATE,
-                match_name=match_user.display_name,
+            html = _TEMPLATES['match'].render(
+                match_name=match_name,
                 match_photo=match_user.primary_photo_url,
                 match_id=match.id,
                 app_url=EmailNotificationService.get_app_url()
             )
             
             send_email_direct(
-                subject=f"💕 It's a Match! You matched with {match_user.display_name}",
+                subject=f"💕 It's a Match! You matched with {match_name}",
                 recipients=[recipient.email],
                 html_body=html,
-                text_body=f"You matched with {match_user.display_name}! Start chatting now."
+                text_body=f"You matched with {match_name}! Start chatting now."
             )
             return True
         except Exception as e:
@@ -165,12 +177,12 @@ class EmailNotificationService:
     @staticmethod
     def send_new_message_email(recipient, sender, message, match):
         """Send email notification for a new message."""
+        sender_name = sender.display_name
         try:
             preview = message.content[:100] + '...' if len(message.content) > 100 else message.content
             
-            html = render_template_string(
-                NEW_MESSAGE_TEMPLATE,
-                sender_name=sender.display_name,
+            html = _TEMPLATES['message'].render(
+                sender_name=sender_name,
                 sender_photo=sender.primary_photo_url,
                 message_preview=preview,
                 match_id=match.id,
@@ -178,10 +190,10 @@ class EmailNotificationService:
             )
             
             send_email_direct(
-                subject=f"💬 New message from {sender.display_name}",
+                subject=f"💬 New message from {sender_name}",
                 recipients=[recipient.email],
                 html_body=html,
-                text_body=f"{sender.display_name}: {preview}"
+                text_body=f"{sender_name}: {preview}"
             )
             return True
         except Exception as e:
@@ -191,19 +203,19 @@ class EmailNotificationService:
     @staticmethod
     def send_super_like_email(recipient, liker):
         """Send email notification for a super like."""
+        liker_name = liker.display_name
         try:
-            html = render_template_string(
-                SUPER_LIKE_TEMPLATE,
-                liker_name=liker.display_name,
+            html = _TEMPLATES['super_like'].render(
+                liker_name=liker_name,
                 liker_photo=liker.primary_photo_url,
                 app_url=EmailNotificationService.get_app_url()
             )
             
             send_email_direct(
-                subject=f"⭐ {liker.display_name} Super Liked you!",
+                subject=f"⭐ {liker_name} Super Liked you!",
                 recipients=[recipient.email],
                 html_body=html,
-                text_body=f"{liker.display_name} super liked you! Check them out on Două Inimi."
+                text_body=f"{liker_name} super liked you! Check them out on Două Inimi."
             )
             return True
         except Exception as e:
@@ -0,0 +1,135 @@
+"""Background photo processing - resize, thumbnail and upload off the request thread."""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+from flask import current_app
+from app.extensions import db
+from app.utils.image import process_uploaded_image
+from app.utils.storage import upload_photos_to_storage, delete_photos_from_storage
+
+# Uploads and deletions share a small bounded pool rather than a thread
+# each, so a burst of uploads can't decode dozens of images at once
+PHOTO_WORKER_COUNT = 4
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    """Return the shared photo worker pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=PHOTO_WORKER_COUNT, thread_name_prefix='photo-worker'
+                )
+    return _executor
+
+
+def process_and_upload_photo(app, photo_id, raw_bytes, filename, thumb_filename):
+    """Process an uploaded image and store it, then mark the photo ready.
+
+    Args:
+        app: Flask app (runs in its own app context)
+        photo_id: ID of the Photo row created with processing_status='processing'
+        raw_bytes: Original upload bytes
+        filename: Storage filename for the main image
+        thumb_filename: Storage filename for the thumbnail
+    """
+    from app.models.photo import Photo
+
+    with app.app_context():
+        photo = db.session.get(Photo, photo_id)
+        if not photo:
+            return  # Deleted while processing
+
+        results = []
+        try:
+            success, error_msg, image_data = process_uploaded_image(
+                BytesIO(raw_bytes),
+                output_path=None,  # Return bytes instead of saving to file
+                create_thumbnail=True
+            )
+            if not success:
+                raise ValueError(error_msg)
+
+            img_bytes, thumb_bytes = image_data
+
+            # Upload image and thumbnail concurrently to Azure Blob Storage (or local fallback)
+            uploads = [(img_bytes, filename)]
+            if thumb_bytes:
+                uploads.append((thumb_bytes, thumb_filename))
+            results = upload_photos_to_storage(uploads)
+
+            # One UPDATE by id: if the user deleted the photo while it was
+            # processing, no row matches and the stored files are removed
+            url, storage_type = results[0]
+            updated = Photo.query.filter_by(id=photo_id).update({
+                Photo.url: url,
+                Photo.thumbnail_url: results[1][0] if thumb_bytes else None,
+                Photo.processing_status: 'ready',
+            }, synchronize_session=False)
+            db.session.commit()
+            if not updated:
+                delete_photos_from_storage([url for url, _ in results])
+                return
+
+            storage_msg = "Azure Blob" if storage_type == 'azure' else "local"
+            current_app.logger.info(f"Photo uploaded to {storage_msg}: {filename}")
+        except Exception as e:
+            current_app.logger.error(f"Photo processing failed for photo {photo_id}: {e}")
+            db.session.rollback()
+            # Nothing points at files stored before the failure
+            if results:
+                delete_photos_from_storage([url for url, _ in results])
+            # UPDATE by id rather than flushing `photo`, which may have been
+            # deleted while processing
+            try:
+                Photo.query.filter_by(id=photo_id).update(
+                    {Photo.processing_status: 'failed'}, synchronize_session=False
+                )
+                db.session.commit()
+            except Exception as mark_error:
+                db.session.rollback()
+                current_app.logger.error(f"Could not mark photo {photo_id} as failed: {mark_error}")
+
+
+def queue_photo_processing(photo, raw_bytes, filename, thumb_filename):
+    """Process and upload a photo on the background worker pool.
+
+    Runs inline when PHOTO_PROCESSING_ASYNC is off (e.g. tests).
+    """
+    app = current_app._get_current_object()
+    args = [app, photo.id, raw_bytes, filename, thumb_filename]
+
+    if not current_app.config.get('PHOTO_PROCESSING_ASYNC', True):
+        process_and_upload_photo(*args)
+        return
+
+    _get_executor().submit(process_and_upload_photo, *args)
+
+
+def delete_photos_in_background(app, urls):
+    """Remove stored photos, logging (not raising) failures."""
+    with app.app_context():
+        deleted = delete_photos_from_storage(urls)
+        current_app.logger.info(f"Deleted {deleted}/{len(urls)} stored photos")
+
+
+def queue_photo_deletion(urls):
+    """Delete stored photos on the background worker pool.
+
+    Runs inline when PHOTO_PROCESSING_ASYNC is off (e.g. tests).
+    """
+    if not urls:
+        return
+
+    app = current_app._get_current_object()
+    args = [app, list(urls)]
+
+    if not current_app.config.get('PHOTO_PROCESSING_ASYNC', True):
+        delete_photos_in_background(*args)
+        return
+
+    _get_executor().submit(delete_photos_in_background, *args)
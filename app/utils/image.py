@@ -1,7 +1,8 @@
 """Image processing utilities - compression, resize, thumbnails."""
+import math
 import os
 from io import BytesIO
-from PIL import Image, ImageOps, ExifTags
+from PIL import Image, ImageOps
 
 
 # Constants
@@ -9,6 +10,10 @@ MAX_IMAGE_SIZE = (1200, 1200)  # Max dimensions for uploaded photos
 THUMBNAIL_SIZE = (300, 300)    # Size for thumbnails
 JPEG_QUALITY = 85              # Quality for JPEG compression
 MAX_FILE_SIZE_MB = 5           # Max file size in MB
+# thumbnail() box-reduces by an integer factor in C before LANCZOS once the
+# source is this many times the target; Pillow's default of 2.0 skips the
+# reduce for the common 3-4x phone-photo downscale
+RESIZE_REDUCING_GAP = 1.5
 
 
 def process_uploaded_image(file, output_path=None, create_thumbnail=True):
@@ -32,6 +37,16 @@ def process_uploaded_image(file, output_path=None, create_thumbnail=True):
         # Open image
         img = Image.open(file)
         
+        # Let libjpeg decode JPEGs at a reduced scale (1/2, 1/4, 1/8) when the
+        # source is much larger than MAX_IMAGE_SIZE - far cheaper than a full
+        # decode followed by a resize. Ask for the size thumbnail() will
+        # produce (not the square bound) so wide/tall photos reduce too.
+        # EXIF stays in img.info, so orientation is still applied below.
+        if img.format == 'JPEG':
+            scale = min(MAX_IMAGE_SIZE[0] / img.width, MAX_IMAGE_SIZE[1] / img.height)
+            if scale < 1:
+                img.draft('RGB', (int(img.width * scale), int(img.height * scale)))
+        
         # Fix orientation based on EXIF data
         img = fix_image_orientation(img)
         
@@ -47,20 +62,19 @@ def process_uploaded_image(file, output_path=None, create_thumbnail=True):
             img = img.convert('RGB')
         
         # Resize if too large
-        img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
+        img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
         
         # If no output path, return bytes (for Azure Blob Storage)
         if output_path is None:
             # Get main image bytes
             img_buffer = BytesIO()
-            img.save(img_buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            img.save(img_buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
             img_bytes = img_buffer.getvalue()
             
             # Get thumbnail bytes if requested
             thumb_bytes = None
             if create_thumbnail:
-                thumb = img.copy()
-                thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+                thumb = make_thumbnail(img)
                 thumb_buffer = BytesIO()
                 thumb.save(thumb_buffer, 'JPEG', quality=80, optimize=True)
                 thumb_bytes = thumb_buffer.getvalue()
@@ -68,13 +82,12 @@ def process_uploaded_image(file, output_path=None, create_thumbnail=True):
             return True, None, (img_bytes, thumb_bytes)
         
         # Save to file path (legacy local storage)
-        img.save(output_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        img.save(output_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
         
         # Create thumbnail if requested
         thumbnail_path = None
         if create_thumbnail:
-            thumb = img.copy()
-            thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+            thumb = make_thumbnail(img)
             
             # Generate thumbnail path
             base, ext = os.path.splitext(output_path)
@@ -87,46 +100,40 @@ def process_uploaded_image(file, output_path=None, create_thumbnail=True):
         return False, str(e), None
 
 
+def make_thumbnail(img, size=THUMBNAIL_SIZE):
+    """
+    Return a downscaled copy of img that fits within size.
+    Same result as img.copy().thumbnail(size) without first copying the
+    full-size buffer - resize() already writes into a new image.
+    """
+    width, height = img.size
+    max_w, max_h = size
+    if width <= max_w and height <= max_h:
+        return img.copy()
+    
+    # Aspect-preserving target, rounded the way Image.thumbnail() does
+    aspect = width / height
+    if max_w / max_h >= aspect:
+        target = (_round_aspect(max_h * aspect, lambda n: abs(aspect - n / max_h)), max_h)
+    else:
+        target = (max_w, _round_aspect(max_w / aspect, lambda n: 0 if n == 0 else abs(aspect - max_w / n)))
+    
+    return img.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def _round_aspect(number, key):
+    return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+
 def fix_image_orientation(img):
     """
     Fix image orientation based on EXIF data.
     Mobile photos often need rotation.
     """
     try:
-        # Get EXIF data
-        exif = img._getexif()
-        if exif is None:
-            return img
-        
-        # Find orientation tag
-        orientation_key = None
-        for key, val in ExifTags.TAGS.items():
-            if val == 'Orientation':
-                orientation_key = key
-                break
-        
-        if orientation_key is None or orientation_key not in exif:
-            return img
-        
-        orientation = exif[orientation_key]
-        
-        # Apply rotation/flip based on orientation
-        if orientation == 2:
-            img = img.transpose(Image.FLIP_LEFT_RIGHT)
-        elif orientation == 3:
-            img = img.rotate(180)
-        elif orientation == 4:
-            img = img.rotate(180).transpose(Image.FLIP_LEFT_RIGHT)
-        elif orientation == 5:
-            img = img.rotate(-90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
-        elif orientation == 6:
-            img = img.rotate(-90, expand=True)
-        elif orientation == 7:
-            img = img.rotate(90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
-        elif orientation == 8:
-            img = img.rotate(90, expand=True)
-        
-        return img
+        # Reads tag 0x0112 directly and handles all 8 orientations
+        transposed = ImageOps.exif_transpose(img)
+        return transposed if transposed is not None else img
         
     except Exception:
         return img
@@ -135,6 +142,7 @@ def fix_image_orientation(img):
 def validate_image_file(file):
     """
     Validate an image file before processing.
+    Accepts any seekable file-like object (FileStorage stream or BytesIO).
     Returns (is_valid, error_message)
     """
     if not file:
@@ -154,14 +162,12 @@ def validate_image_file(file):
     # Verify it's a valid image
     try:
         img = Image.open(file)
+        # Dimensions come from the header, so read them before verify()
+        # leaves the image unusable - no need to open the file twice
+        width, height = img.size
         img.verify()  # Verify it's a valid image
         file.seek(0)  # Reset file pointer
         
-        # Check dimensions (reject very small images)
-        img = Image.open(file)
-        width, height = img.size
-        file.seek(0)
-        
         if width < 100 or height < 100:
             return False, "Image too small. Minimum size is 100x100 pixels"
         
@@ -191,15 +197,22 @@ def create_blur_preview(image_path, output_path, blur_radius=20):
         from PIL import ImageFilter
         
         with Image.open(image_path) as img:
+            size = img.size
+            
+            # Only a 50px thumbnail is needed, so let JPEGs decode at 1/8 scale
+            img.draft('RGB', (50, 50))
+            
             # Create small thumbnail then scale up for pixelated blur effect
             small = img.copy()
             small.thumbnail((50, 50), Image.Resampling.LANCZOS)
             
-            # Scale back up
-            blurred = small.resize(img.size, Image.Resampling.NEAREST)
+            # Blur the 50px buffer (radius scaled to match) rather than the
+            # full-size upscale - same look, bounded cost for any input size
+            radius = max(1, blur_radius * small.width / size[0])
+            small = small.filter(ImageFilter.GaussianBlur(radius=radius))
             
-            # Apply gaussian blur for smoother effect
-            blurred = blurred.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+            # Scale back up smoothly
+            blurred = small.resize(size, Image.Resampling.BILINEAR)
             
             # Save
             if blurred.mode != 'RGB':
@@ -1,10 +1,12 @@
 """Content moderation utilities for auto-flagging suspicious content."""
 import re
+import string
+import time
 from datetime import datetime
 
 
-# Suspicious patterns
-SPAM_PATTERNS = [
+# Suspicious patterns (compiled once at import)
+SPAM_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
     r'(https?://\S+){2,}',  # Multiple URLs
     r'(whatsapp|telegram|signal|viber)\s*[:\s]*[\d\+\(\)]',  # Phone app + number
     r'(cash\s*app|venmo|paypal|zelle|bitcoin|crypto)',  # Payment/crypto
@@ -14,7 +16,11 @@ SPAM_PATTERNS = [
     r'(\bescort\b|\bprostitu)',  # Explicit services
     r'(nigerian|prince|inheritance|lottery)\s*(money|winner)',  # Scam patterns
     r'(\b\d{3}[-.]?\d{3}[-.]?\d{4}\b)',  # Phone numbers in bio
-]
+)]
+
+REPETITIVE_CHARS = re.compile(r'(.)\1{4,}')
+
+_ASCII_UPPER = string.ascii_uppercase.encode('ascii')
 
 # Suspicious words (partial match)
 SUSPICIOUS_WORDS = [
@@ -26,6 +32,8 @@ SUSPICIOUS_WORDS = [
     'sugar daddy', 'sugar mommy', 'arrangement',
 ]
 
+SEVERITY_ORDER = {'none': 0, 'low': 1, 'medium': 2, 'high': 3}
+
 # Required for verification
 MINIMUM_BIO_LENGTH = 20
 MINIMUM_PHOTOS = 1
@@ -45,45 +53,43 @@ class ModerationResult:
         self.flags.append({
             'reason': reason,
             'severity': severity,
-            'timestamp': datetime.utcnow().isoformat()
+            # Epoch seconds; formatted as ISO-8601 only when serialized
+            'timestamp': time.time()
         })
         
         # Update overall severity
-        severity_order = {'none': 0, 'low': 1, 'medium': 2, 'high': 3}
-        if severity_order.get(severity, 0) > severity_order.get(self.severity, 0):
+        if SEVERITY_ORDER.get(severity, 0) > SEVERITY_ORDER.get(self.severity, 0):
             self.severity = severity
     
     def to_dict(self):
         return {
             'is_flagged': self.is_flagged,
-            'flags': self.flags,
+            'flags': [
+                {**flag, 'timestamp': datetime.utcfromtimestamp(flag['timestamp']).isoformat()}
+                for flag in self.flags
+            ],
             'severity': self.severity,
             'auto_action': self.auto_action
         }
 
 
-def moderate_text(text, field_name='content'):
-    """
-    Check text content for suspicious patterns.
-    
-    Args:
-        text: Text to check
-        field_name: Name of the field being checked (for reporting)
-    
-    Returns:
-        ModerationResult
-    """
-    result = ModerationResult()
-    
-    if not text:
-        return result
-    
+def _count_upper(text):
+    """Count uppercase characters, in C for the common ASCII case."""
+    if text.isascii():
+        raw = text.encode('ascii')
+        return len(raw) - len(raw.translate(None, _ASCII_UPPER))
+    # Diacritics (Ș, Ă, Î...) need the Unicode-aware check
+    return sum(1 for c in text if c.isupper())
+
+
+def _check_text(result, text, field_name):
+    """Add a flag to result for each check text fails."""
     text_lower = text.lower()
     
     # Check spam patterns
     for pattern in SPAM_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            result.add_flag(f"Suspicious pattern in {field_name}: {pattern}", 'medium')
+        if pattern.search(text):
+            result.add_flag(f"Suspicious pattern in {field_name}: {pattern.pattern}", 'medium')
     
     # Check suspicious words
     for word in SUSPICIOUS_WORDS:
@@ -92,13 +98,32 @@ def moderate_text(text, field_name='content'):
     
     # Check for excessive caps (shouting)
     if len(text) > 20:
-        caps_ratio = sum(1 for c in text if c.isupper()) / len(text)
+        caps_ratio = _count_upper(text) / len(text)
         if caps_ratio > 0.5:
             result.add_flag(f"Excessive caps in {field_name}", 'low')
     
     # Check for repetitive characters
-    if re.search(r'(.)\1{4,}', text):
+    if REPETITIVE_CHARS.search(text):
         result.add_flag(f"Repetitive characters in {field_name}", 'low')
+
+
+def moderate_text(text, field_name='content'):
+    """
+    Check text content for suspicious patterns.
+    
+    Args:
+        text: Text to check
+        field_name: Name of the field being checked (for reporting)
+    
+    Returns:
+        ModerationResult
+    """
+    result = ModerationResult()
+    
+    if not text:
+        return result
+    
+    _check_text(result, text, field_name)
     
     # Determine auto-action based on severity
     if result.severity == 'high':
@@ -127,9 +152,7 @@ def moderate_profile(profile):
     
     # Check bio
     if profile.bio:
-        bio_result = moderate_text(profile.bio, 'bio')
-        for flag in bio_result.flags:
-            result.add_flag(flag['reason'], flag['severity'])
+        _check_text(result, profile.bio, 'bio')
     
     # Check if bio is too short
     if profile.bio and len(profile.bio.strip()) < MINIMUM_BIO_LENGTH:
@@ -137,15 +160,11 @@ def moderate_profile(profile):
     
     # Check occupation
     if profile.occupation:
-        occ_result = moderate_text(profile.occupation, 'occupation')
-        for flag in occ_result.flags:
-            result.add_flag(flag['reason'], flag['severity'])
+        _check_text(result, profile.occupation, 'occupation')
     
     # Check church name (unlikely spam, but check anyway)
     if profile.church_name:
-        church_result = moderate_text(profile.church_name, 'church_name')
-        for flag in church_result.flags:
-            result.add_flag(flag['reason'], flag['severity'])
+        _check_text(result, profile.church_name, 'church_name')
     
     # Determine final action
     if result.severity == 'high':
@@ -219,7 +238,7 @@ def check_profile_completeness(user):
     return len(missing) == 0, missing
 
 
-def flag_user_for_review(user, reason, severity='medium'):
+def flag_user_for_review(user, reason, severity='medium', commit=True):
     """
     Flag a user for admin review.
     
@@ -227,6 +246,8 @@ def flag_user_for_review(user, reason, severity='medium'):
         user: User model instance
         reason: Reason for flagging
         severity: 'low', 'medium', 'high'
+        commit: Commit immediately; pass False to include the report in the
+            caller's transaction
     """
     from app.extensions import db
     from app.models.report import Report
@@ -241,7 +262,8 @@ def flag_user_for_review(user, reason, severity='medium'):
     )
     
     db.session.add(report)
-    db.session.commit()
+    if commit:
+        db.session.commit()
     
     return report
 
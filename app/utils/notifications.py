@@ -2,6 +2,87 @@
 from datetime import datetime
 
 
+BASE_ICON = '/static/images/logo.png'
+BADGE_ICON = '/static/icons/icon-72x72.png'
+
+
+# Static part of each payload, built once; builders copy it and fill in
+# the fields that depend on the event. Vibration patterns are tuples so
+# the shallow copies can't mutate the shared template.
+_TEMPLATES = {
+    'new_match': {
+        'title': "💕 It's a Match!",
+        'badge': BADGE_ICON,
+        'vibrate': (200, 100, 200, 100, 200),
+        'requireInteraction': True,
+    },
+    'new_message': {
+        'badge': BADGE_ICON,
+        'vibrate': (100, 50, 100),
+        'renotify': True,  # Alert again for same conversation
+    },
+    'super_like': {
+        'title': "⭐ Super Liked!",
+        'badge': BADGE_ICON,
+        'url': '/discover',
+        'vibrate': (100, 100, 100, 100, 200),
+        'requireInteraction': True,
+    },
+    'profile_view': {
+        'title': "👀 Profile Viewed",
+        'badge': BADGE_ICON,
+        'tag': 'profile-view',
+        'url': '/discover',
+        'silent': True,  # Don't make sound
+    },
+}
+
+
+def _new_match_payload(data):
+    match_id = data.get('match_id', '')
+    payload = _TEMPLATES['new_match'].copy()
+    payload['body'] = f"You and {data.get('user_name', 'Someone')} have liked each other!"
+    payload['icon'] = data.get('user_photo', BASE_ICON)
+    payload['tag'] = f"match-{match_id}"
+    payload['url'] = f"/messages/{match_id}"
+    return payload
+
+
+def _new_message_payload(data):
+    match_id = data.get('match_id', '')
+    payload = _TEMPLATES['new_message'].copy()
+    payload['title'] = f"💬 {data.get('sender_name', 'Someone')}"
+    payload['body'] = data.get('message_preview', 'Sent you a message')
+    payload['icon'] = data.get('sender_photo', BASE_ICON)
+    payload['tag'] = f"message-{match_id}"
+    payload['url'] = f"/messages/{match_id}"
+    return payload
+
+
+def _super_like_payload(data):
+    payload = _TEMPLATES['super_like'].copy()
+    payload['body'] = f"{data.get('user_name', 'Someone')} super liked you!"
+    payload['icon'] = data.get('user_photo', BASE_ICON)
+    payload['tag'] = f"superlike-{data.get('user_id', '')}"
+    return payload
+
+
+def _profile_view_payload(data):
+    payload = _TEMPLATES['profile_view'].copy()
+    payload['body'] = f"{data.get('user_name', 'Someone')} viewed your profile"
+    payload['icon'] = data.get('user_photo', BASE_ICON)
+    return payload
+
+
+# Only the requested payload is built, not all of them per call
+_PAYLOAD_BUILDERS = {
+    'new_match': _new_match_payload,
+    'new_message': _new_message_payload,
+    'super_like': _super_like_payload,
+    'profile_view': _profile_view_payload,
+}
+
+
 def get_notification_payload(notification_type, data):
     """
     Generate notification payload for different event types.
@@ -13,57 +94,15 @@ def get_notification_payload(notification_type, data):
     Returns:
         Dict with title, body, icon, url, and other notification options
     """
-    base_icon = '/static/images/logo.png'
-    badge_icon = '/static/icons/icon-72x72.png'
-    
-    notifications = {
-        'new_match': {
-            'title': "💕 It's a Match!",
-            'body': f"You and {data.get('user_name', 'Someone')} have liked each other!",
-            'icon': data.get('user_photo', base_icon),
-            'badge': badge_icon,
-            'tag': f"match-{data.get('match_id', '')}",
-            'url': f"/messages/{data.get('match_id', '')}",
-            'vibrate': [200, 100, 200, 100, 200],
-            'requireInteraction': True,
-        },
-        'new_message': {
-            'title': f"💬 {data.get('sender_name', 'Someone')}",
-            'body': data.get('message_preview', 'Sent you a message'),
-            'icon': data.get('sender_photo', base_icon),
-            'badge': badge_icon,
-            'tag': f"message-{data.get('match_id', '')}",
-            'url': f"/messages/{data.get('match_id', '')}",
-            'vibrate': [100, 50, 100],
-            'renotify': True,  # Alert again for same conversation
-        },
-        'super_like': {
-            'title': "⭐ Super Liked!",
-            'body': f"{data.get('user_name', 'Someone')} super liked you!",
-            'icon': data.get('user_photo', base_icon),
-            'badge': badge_icon,
-            'tag': f"superlike-{data.get('user_id', '')}",
-            'url': '/discover',
-            'vibrate': [100, 100, 100, 100, 200],
-            'requireInteraction': True,
-        },
-        'profile_view': {
-            'title': "👀 Profile Viewed",
-            'body': f"{data.get('user_name', 'Someone')} viewed your profile",
-            'icon': data.get('user_photo', base_icon),
-            'badge': badge_icon,
-            'tag': 'profile-view',
-            'url': '/discover',
-            'silent': True,  # Don't make sound
-        },
-    }
-    
-    return notifications.get(notification_type, {
-        'title': 'Două Inimi',
-        'body': 'You have a new notification',
-        'icon': base_icon,
-        'url': '/',
-    })
+    builder = _PAYLOAD_BUILDERS.get(notification_type)
+    if builder is None:
+        return {
+            'title': 'Două Inimi',
+            'body': 'You have a new notification',
+            'icon': BASE_ICON,
+            'url': '/',
+        }
+    return builder(data)
 
 
 class NotificationService:
@@ -74,23 +113,27 @@ class NotificationService:
         """
         Send notification for a new match.
         Called when a mutual like creates a match.
+        
+        Both users are normally already in the session (the liker and the
+        liked user), so match.user1/user2 resolve from the identity map.
         """
         # Get both users
         user1 = match.user1
         user2 = match.user2
+        match_id = match.id
         
         # Notify user1 about user2
         payload1 = get_notification_payload('new_match', {
             'user_name': user2.display_name,
             'user_photo': user2.primary_photo_url,
-            'match_id': match.id,
+            'match_id': match_id,
         })
         
         # Notify user2 about user1
         payload2 = get_notification_payload('new_match', {
             'user_name': user1.display_name,
             'user_photo': user1.primary_photo_url,
-            'match_id': match.id,
+            'match_id': match_id,
         })
         
         # In production, these would be sent via Web Push API
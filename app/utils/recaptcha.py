@@ -1,7 +1,15 @@
 """reCAPTCHA verification utilities."""
+from functools import lru_cache
+
 import requests
+from requests.adapters import HTTPAdapter
 from flask import current_app, request
 
+# Shared session so siteverify calls reuse a pooled keep-alive TLS
+# connection instead of a fresh handshake per signup
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 
 def verify_recaptcha(response_token):
     """
@@ -32,7 +40,7 @@ def verify_recaptcha(response_token):
             'remoteip': get_client_ip()
         }
         
-        response = requests.post(verify_url, data=payload, timeout=5)
+        response = _SESSION.post(verify_url, data=payload, timeout=5)
         result = response.json()
         
         if result.get('success'):
@@ -96,13 +104,16 @@ def get_recaptcha_html():
     Get HTML for reCAPTCHA widget.
     Returns empty string if not configured.
     """
-    site_key = current_app.config.get('RECAPTCHA_SITE_KEY')
-    
+    config = current_app.config
+    return _build_recaptcha_html(config.get('RECAPTCHA_SITE_KEY'), config.get('RECAPTCHA_TYPE', 'v2'))
+
+
+@lru_cache(maxsize=4)
+def _build_recaptcha_html(site_key, recaptcha_type):
+    """Render the widget markup once per (site_key, recaptcha_type)."""
     if not site_key:
         return ''
     
-    recaptcha_type = current_app.config.get('RECAPTCHA_TYPE', 'v2')
-    
     if recaptcha_type == 'v3':
         # reCAPTCHA v3 (invisible)
         return f'''
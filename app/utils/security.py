@@ -1,11 +1,56 @@
 """Security utilities for input validation, sanitization, and protection."""
 import re
 import html
+import time
+import unicodedata
 from functools import wraps
+from itertools import islice
 from flask import request, abort, current_app
 from flask_login import current_user
 
 
+# Patterns compiled once at import rather than looked up per call
+_TAG_RE = re.compile(r'<[^>]+>')
+# Only runs that actually change (2+ blanks or any tab); a single space is
+# already normalized, and rewriting each one dominated sanitize_message
+_SPACES_RE = re.compile(r'\t[ \t]*| [ \t]+')
+_NEWLINES_RE = re.compile(r'\n{3,}')
+_INVISIBLE_RE = re.compile(r'[\u200b-\u200f\u2028-\u202f\u2060\ufeff]')
+_NAME_DISALLOWED_RE = re.compile(r'[^\w\s\-\'\.]', re.UNICODE)
+# The same character class over ASCII, as a bytes.translate delete set
+_NAME_DISALLOWED_ASCII = bytes(i for i in range(128) if _NAME_DISALLOWED_RE.match(chr(i)))
+_UPPER_RE = re.compile(r'[A-Z]')
+_LOWER_RE = re.compile(r'[a-z]')
+_DIGIT_RE = re.compile(r'\d')
+
+# Too many URLs: count URL starts (capped at the limit) instead of a
+# repeated group, which only matched URLs glued together with no space
+# between them and had to backtrack through every \S+ split to fail
+_URL_START_RE = re.compile(r'https?://\S')
+MAX_URLS_PER_MESSAGE = 2
+
+# Spam patterns
+_SPAM_PATTERNS = [re.compile(p) for p in (
+    r'(whatsapp|telegram|signal)\s*[:\s]*[\d\+]',  # Phone number solicitation
+    r'(cash\s*app|venmo|paypal|zelle)\s*[@\:]',  # Payment solicitation
+    r'(bitcoin|crypto|btc|eth)\s*(wallet|address)',  # Crypto spam
+    r'make\s*\$?\d+\s*per\s*(day|hour|week)',  # Get rich quick
+    r'(hot|sexy)\s*(singles|women|girls|men)\s*(near|in)',  # Dating spam
+)]
+
+# Magic numbers for accepted upload types (WebP is checked separately)
+_IMAGE_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'\xff\xd8\xff',  # JPEG
+    b'GIF87a', b'GIF89a',  # GIF
+)
+
+_COMMON_PASSWORDS = frozenset({
+    'password', '12345678', 'qwerty123', 'password1', 'letmein',
+    'welcome1', 'monkey12', 'dragon12', 'master12', 'login123'
+})
+
+
 # --- Input Sanitization ---
 
 def sanitize_html(text):
@@ -17,7 +62,9 @@ def sanitize_html(text):
         return text
     
     # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', str(text))
+    text = str(text)
+    if '<' in text:
+        text = _TAG_RE.sub('', text)
     
     # Escape remaining special characters
     text = html.escape(text)
@@ -40,17 +87,28 @@ def sanitize_message(content):
     content = str(content).strip()
     
     # Remove HTML tags
-    content = re.sub(r'<[^>]+>', '', content)
+    if '<' in content:
+        content = _TAG_RE.sub('', content)
     
     # Escape HTML entities
     content = html.escape(content)
     
-    # Normalize whitespace (but keep single newlines for formatting)
-    content = re.sub(r'[ \t]+', ' ', content)  # Multiple spaces/tabs to single space
-    content = re.sub(r'\n{3,}', '\n\n', content)  # Max 2 consecutive newlines
-    
-    # Remove zero-width characters and other invisibles (potential attacks)
-    content = re.sub(r'[\u200b-\u200f\u2028-\u202f\u2060\ufeff]', '', content)
+    # Normalize whitespace (but keep single newlines for formatting). Each
+    # pass is gated on a C-level substring check; clean text skips them all
+    if '  ' in content or '\t' in content:
+        content = _SPACES_RE.sub(' ', content)  # Multiple spaces/tabs to single space
+    if '\n\n\n' in content:
+        content = _NEWLINES_RE.sub('\n\n', content)  # Max 2 consecutive newlines
+    
+    if not content.isascii():
+        # Canonical (NFC) form so decomposed diacritics (S + comma below)
+        # compare and search like the precomposed ones; the quick check
+        # skips the full pass for text that is already NFC
+        if not unicodedata.is_normalized('NFC', content):
+            content = unicodedata.normalize('NFC', content)
+        
+        # Remove zero-width characters and other invisibles (potential attacks)
+        content = _INVISIBLE_RE.sub('', content)
     
     return content.strip()
 
@@ -75,10 +133,15 @@ def sanitize_username(name):
         return name
     
     # Remove HTML
-    name = re.sub(r'<[^>]+>', '', str(name))
+    name = str(name)
+    if '<' in name:
+        name = _TAG_RE.sub('', name)
     
     # Only allow alphanumeric, spaces, and basic punctuation
-    name = re.sub(r'[^\w\s\-\'\.]', '', name, flags=re.UNICODE)
+    if name.isascii():
+        name = name.encode('ascii').translate(None, _NAME_DISALLOWED_ASCII).decode('ascii')
+    else:
+        name = _NAME_DISALLOWED_RE.sub('', name)
     
     # Normalize whitespace
     name = ' '.join(name.split())
@@ -125,18 +188,12 @@ def is_spam_content(content):
     
     content_lower = content.lower()
     
-    # Spam patterns
-    spam_patterns = [
-        r'(https?://\S+){3,}',  # Too many URLs
-        r'(whatsapp|telegram|signal)\s*[:\s]*[\d\+]',  # Phone number solicitation
-        r'(cash\s*app|venmo|paypal|zelle)\s*[@\:]',  # Payment solicitation
-        r'(bitcoin|crypto|btc|eth)\s*(wallet|address)',  # Crypto spam
-        r'make\s*\$?\d+\s*per\s*(day|hour|week)',  # Get rich quick
-        r'(hot|sexy)\s*(singles|women|girls|men)\s*(near|in)',  # Dating spam
-    ]
-    
-    for pattern in spam_patterns:
-        if re.search(pattern, content_lower):
+    limit = MAX_URLS_PER_MESSAGE + 1
+    if len(list(islice(_URL_START_RE.finditer(content_lower), limit))) == limit:
+        return True
+    
+    for pattern in _SPAM_PATTERNS:
+        if pattern.search(content_lower):
             return True
     
     # Check for excessive repetition
@@ -220,6 +277,13 @@ def validate_socket_user():
     return None
 
 
+# Socket events re-check the same match on every message/typing/read, and a
+# match's two participants never change, so the pair is cached per match.
+SOCKET_MATCH_CACHE_TTL = 60  # seconds; bounds staleness for deleted matches
+SOCKET_MATCH_CACHE_MAX = 10000
+_socket_match_users = {}  # match_id -> (expires_at, user1_id, user2_id)
+
+
 def validate_socket_match_access(match_id, user_id):
     """
     Validate that a user has access to a match conversation.
@@ -229,12 +293,20 @@ def validate_socket_match_access(match_id, user_id):
     
     if not match_id or not user_id:
         return False
-    
-    match = Match.query.get(match_id)
-    if not match:
+
+    now = time.monotonic()
+    cached = _socket_match_users.get(match_id)
+    if cached is not None and cached[0] > now:
+        return user_id == cached[1] or user_id == cached[2]
+
+    match = Match.get_for_user(match_id, user_id)
+    if match is None:
         return False
-    
-    return match.user1_id == user_id or match.user2_id == user_id
+
+    if len(_socket_match_users) >= SOCKET_MATCH_CACHE_MAX:
+        _socket_match_users.clear()
+    _socket_match_users[match_id] = (now + SOCKET_MATCH_CACHE_TTL, match.user1_id, match.user2_id)
+    return True
 
 
 # --- Password Validation ---
@@ -253,21 +325,17 @@ def validate_password_strength(password):
     if len(password) > 128:
         return False, "Password is too long"
     
-    if not re.search(r'[A-Z]', password):
+    if not _UPPER_RE.search(password):
         return False, "Password must contain at least one uppercase letter"
     
-    if not re.search(r'[a-z]', password):
+    if not _LOWER_RE.search(password):
         return False, "Password must contain at least one lowercase letter"
     
-    if not re.search(r'\d', password):
+    if not _DIGIT_RE.search(password):
         return False, "Password must contain at least one number"
     
     # Check for common passwords
-    common_passwords = [
-        'password', '12345678', 'qwerty123', 'password1', 'letmein',
-        'welcome1', 'monkey12', 'dragon12', 'master12', 'login123'
-    ]
-    if password.lower() in common_passwords:
+    if password.lower() in _COMMON_PASSWORDS:
         return False, "Password is too common"
     
     return True, None
@@ -296,19 +364,13 @@ def validate_image_upload(file):
     
     # Check file size (read first few bytes to check magic number)
     file.seek(0)
-    header = file.read(8)
+    header = file.read(12)
     file.seek(0)
     
-    # Check magic numbers for image types
-    valid_signatures = [
-        b'\x89PNG\r\n\x1a\n',  # PNG
-        b'\xff\xd8\xff',  # JPEG
-        b'GIF87a', b'GIF89a',  # GIF
-        b'RIFF',  # WebP (starts with RIFF, then WEBP)
-    ]
-    
-    is_valid_signature = any(header.startswith(sig) for sig in valid_signatures)
-    if not is_valid_signature and not header[:4] == b'RIFF':  # WebP check
+    # Check magic numbers for image types; WebP is a RIFF container, so
+    # also require the WEBP form type (RIFF alone also matches WAV/AVI)
+    is_webp = header[:4] == b'RIFF' and header[8:12] == b'WEBP'
+    if not (header.startswith(_IMAGE_SIGNATURES) or is_webp):
         return False, "Invalid image file"
     
     return True, None
@@ -5,12 +5,19 @@ with fallback to local filesystem for development.
 
 For private containers, SAS tokens are used to generate accessible URLs.
 """
+import hashlib
 import os
+import shutil
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from flask import current_app
 from datetime import datetime, timedelta
 
+# Azure Blob batch API limit on sub-requests per batch
+AZURE_DELETE_BATCH_SIZE = 256
+
 
 def get_blob_service_client():
     """Get Azure Blob Service Client if configured."""
@@ -20,8 +27,7 @@ def get_blob_service_client():
         return None
     
     try:
-        from azure.storage.blob import BlobServiceClient
-        return BlobServiceClient.from_connection_string(connection_string)
+        return _blob_service_client(connection_string)
     except ImportError:
         current_app.logger.warning("azure-storage-blob not installed")
         return None
@@ -30,6 +36,31 @@ def get_blob_service_client():
         return None
 
 
+@lru_cache(maxsize=4)
+def _blob_service_client(connection_string):
+    """Build one BlobServiceClient per connection string for the process.
+    
+    Clients are thread-safe and hold the HTTP connection pool, so reusing
+    one skips re-parsing the string and re-opening TLS connections.
+    """
+    from azure.storage.blob import BlobServiceClient
+    return BlobServiceClient.from_connection_string(connection_string)
+
+
+@lru_cache(maxsize=4)
+def _connection_parts(connection_string):
+    """Split a connection string into its Key=Value settings, once per string."""
+    return dict(part.split('=', 1) for part in connection_string.split(';') if '=' in part)
+
+
+@lru_cache(maxsize=16)
+def _container_url(connection_string, container_name):
+    """Public URL prefix ('.../container/') for blobs in a container."""
+    parts = _connection_parts(connection_string)
+    suffix = parts.get('EndpointSuffix', 'core.windows.net')
+    return f"https://{parts.get('AccountName')}.blob.{suffix}/{container_name}/"
+
+
 def generate_sas_url(blob_name, container_name=None, expiry_hours=8760):
     """Generate a SAS URL for a blob (default 1 year expiry for photos).
     
@@ -41,27 +72,22 @@ def generate_sas_url(blob_name, container_name=None, expiry_hours=8760):
     Returns:
         str: SAS URL or None if failed
     """
-    connection_string = current_app.config.get('AZURE_STORAGE_CONNECTION_STRING')
+    app = current_app._get_current_object()
+    connection_string = app.config.get('AZURE_STORAGE_CONNECTION_STRING')
     if not connection_string:
         return None
     
-    container_name = container_name or current_app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
+    container_name = container_name or app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
     
     try:
-        from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
-        
-        blob_service = BlobServiceClient.from_connection_string(connection_string)
-        account_name = blob_service.account_name
+        from azure.storage.blob import generate_blob_sas, BlobSasPermissions
         
-        # Extract account key from connection string
-        account_key = None
-        for part in connection_string.split(';'):
-            if part.startswith('AccountKey='):
-                account_key = part.replace('AccountKey=', '')
-                break
+        parts = _connection_parts(connection_string)
+        account_name = parts.get('AccountName')
+        account_key = parts.get('AccountKey')
         
         if not account_key:
-            current_app.logger.error("Could not extract account key from connection string")
+            app.logger.error("Could not extract account key from connection string")
             return None
         
         # Generate SAS token with read permission
@@ -74,10 +100,10 @@ def generate_sas_url(blob_name, container_name=None, expiry_hours=8760):
             expiry=datetime.utcnow() + timedelta(hours=expiry_hours)
         )
         
-        return f"https://{account_name}.blob.core.windows.net/{container_name}/{blob_name}?{sas_token}"
+        return _container_url(connection_string, container_name) + blob_name + '?' + sas_token
         
     except Exception as e:
-        current_app.logger.error(f"Failed to generate SAS URL: {e}")
+        app.logger.error(f"Failed to generate SAS URL: {e}")
         return None
 
 
@@ -92,15 +118,12 @@ def upload_photo_to_storage(file_data, filename, content_type='image/jpeg'):
     Returns:
         tuple: (url, storage_type) where storage_type is 'azure' or 'local'
     """
+    app = current_app._get_current_object()
     blob_client = get_blob_service_client()
-    container_name = current_app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
+    container_name = app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
     
-    # Ensure file_data is bytes
-    if hasattr(file_data, 'read'):
-        file_bytes = file_data.read()
-        file_data.seek(0)  # Reset for potential reuse
-    else:
-        file_bytes = file_data
+    # File-like objects are streamed rather than read into memory first
+    is_stream = hasattr(file_data, 'read')
     
     if blob_client:
         try:
@@ -117,7 +140,7 @@ def upload_photo_to_storage(file_data, filename, content_type='image/jpeg'):
             
             from azure.storage.blob import ContentSettings
             blob_client_upload.upload_blob(
-                file_bytes,
+                file_data,
                 content_settings=ContentSettings(content_type=content_type),
                 overwrite=True
             )
@@ -127,69 +150,103 @@ def upload_photo_to_storage(file_data, filename, content_type='image/jpeg'):
             
             if sas_url:
                 url = sas_url
-                current_app.logger.info(f"Uploaded photo to Azure Blob with SAS: {filename}")
+                app.logger.info(f"Uploaded photo to Azure Blob with SAS: {filename}")
             else:
                 # Fallback to public URL (works if container has public access)
-                account_name = blob_client.account_name
-                url = f"https://{account_name}.blob.core.windows.net/{container_name}/{filename}"
-                current_app.logger.info(f"Uploaded photo to Azure Blob (public URL): {filename}")
+                connection_string = app.config['AZURE_STORAGE_CONNECTION_STRING']
+                url = _container_url(connection_string, container_name) + filename
+                app.logger.info(f"Uploaded photo to Azure Blob (public URL): {filename}")
             
             return url, 'azure'
             
         except Exception as e:
-            current_app.logger.error(f"Azure upload failed, falling back to local: {e}")
+            app.logger.error(f"Azure upload failed, falling back to local: {e}")
     
     # Fallback to local filesystem
-    upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
+    upload_folder = os.path.join(app.root_path, 'static', 'uploads')
     os.makedirs(upload_folder, exist_ok=True)
     
     file_path = os.path.join(upload_folder, filename)
     with open(file_path, 'wb') as f:
-        f.write(file_bytes)
+        if is_stream:
+            file_data.seek(0)  # A failed Azure attempt may have consumed it
+            shutil.copyfileobj(file_data, f, 1024 * 1024)
+        else:
+            f.write(file_data)
     
     url = f'/static/uploads/{filename}'
-    current_app.logger.info(f"Uploaded photo to local filesystem: {filename}")
+    app.logger.info(f"Uploaded photo to local filesystem: {filename}")
     return url, 'local'
 
 
+def upload_photos_to_storage(uploads, content_type='image/jpeg'):
+    """Upload several photos concurrently (e.g. an image and its thumbnail).
+    
+    Uploads are independent and network-bound, so the request waits for the
+    slowest one instead of the sum of all of them.
+    
+    Args:
+        uploads: List of (file_data, filename) tuples
+        content_type: MIME type of the files
+        
+    Returns:
+        list: (url, storage_type) tuples in the same order as uploads
+    """
+    if len(uploads) < 2:
+        return [upload_photo_to_storage(data, name, content_type) for data, name in uploads]
+    
+    app = current_app._get_current_object()
+    
+    def _upload(item):
+        with app.app_context():
+            return upload_photo_to_storage(item[0], item[1], content_type)
+    
+    with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+        return list(executor.map(_upload, uploads))
+
+
+def _filename_from_url(url_or_filename):
+    """Extract the blob/file name from a stored photo URL."""
+    if url_or_filename.startswith('http'):
+        # Azure URL: https://account.blob.core.windows.net/container/filename[?sas]
+        return url_or_filename.split('?', 1)[0].split('/')[-1]
+    if url_or_filename.startswith('/static/uploads/'):
+        # Local URL: /static/uploads/filename
+        return url_or_filename.replace('/static/uploads/', '')
+    return url_or_filename
+
+
 def delete_photo_from_storage(url_or_filename):
     """Delete a photo from Azure Blob Storage or local filesystem.
     
     Args:
         url_or_filename: Full URL or just filename
     """
-    # Extract filename from URL
-    if url_or_filename.startswith('http'):
-        # Azure URL: https://account.blob.core.windows.net/container/filename
-        filename = url_or_filename.split('/')[-1]
-    elif url_or_filename.startswith('/static/uploads/'):
-        # Local URL: /static/uploads/filename
-        filename = url_or_filename.replace('/static/uploads/', '')
-    else:
-        filename = url_or_filename
+    filename = _filename_from_url(url_or_filename)
     
+    app = current_app._get_current_object()
     blob_client = get_blob_service_client()
-    container_name = current_app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
+    container_name = app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
     
     if blob_client:
         try:
             container_client = blob_client.get_container_client(container_name)
             blob_client_delete = container_client.get_blob_client(filename)
             blob_client_delete.delete_blob()
-            current_app.logger.info(f"Deleted photo from Azure Blob: {filename}")
+            app.logger.info(f"Deleted photo from Azure Blob: {filename}")
             return True
         except Exception as e:
-            current_app.logger.warning(f"Azure delete failed: {e}")
+            app.logger.warning(f"Azure delete failed: {e}")
     
     # Try local filesystem
     try:
-        file_path = os.path.join(current_app.root_path, 'static', 'uploads', filename)
+        file_path = os.path.join(app.root_path, 'static', 'uploads', filename)
         if os.path.exists(file_path):
             os.remove(file_path)
-            current_app.logger.info(f"Deleted photo from local filesystem: {filename}")
+            app.logger.info(f"Deleted photo from local filesystem: {filename}")
             return True
     except Exception as e:
-        current_app.logger.warning(f"Local delete failed: {e}")
+        app.logger.warning(f"Local delete failed: {e}")
     
     return False
 
@@ -204,6 +261,103 @@ def get_storage_type():
     return 'azure' if blob_client else 'local'
 
 
+def delete_photos_from_storage(urls, max_workers=16):
+    """Delete several photos concurrently.
+    
+    Deletes are independent and network-bound, so all of them are submitted
+    at once and the caller waits for the slowest instead of the sum.
+    Failures are logged, never raised.
+    
+    Args:
+        urls: Iterable of URLs or filenames (falsy entries are skipped)
+        max_workers: Upper bound on concurrent deletes
+        
+    Returns:
+        int: Number of photos deleted
+    """
+    urls = [url for url in urls if url]
+    if not urls:
+        return 0
+    
+    # Azure: one batch request per AZURE_DELETE_BATCH_SIZE blobs
+    blob_client = get_blob_service_client()
+    if blob_client and len(urls) > 1:
+        try:
+            return _delete_blobs_batch(blob_client, urls)
+        except Exception as e:
+            current_app.logger.warning(f"Azure batch delete failed, deleting individually: {e}")
+    
+    app = current_app._get_current_object()
+    
+    def _delete(url):
+        with app.app_context():
+            try:
+                return delete_photo_from_storage(url)
+            except Exception as e:
+                current_app.logger.warning(f"Failed to delete photo from storage: {e}")
+                return False
+    
+    if len(urls) == 1:
+        return int(_delete(urls[0]))
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return sum(executor.map(_delete, urls))
+
+
+def _delete_blobs_batch(blob_client, urls):
+    """Delete blobs with Azure batch requests (up to 256 sub-requests each).
+    
+    Returns:
+        int: Number of blobs deleted
+    """
+    container_name = current_app.config.get('AZURE_STORAGE_CONTAINER', 'photos')
+    container_client = blob_client.get_container_client(container_name)
+    names = [_filename_from_url(url) for url in urls]
+    
+    deleted = 0
+    for i in range(0, len(names), AZURE_DELETE_BATCH_SIZE):
+        responses = container_client.delete_blobs(
+            *names[i:i + AZURE_DELETE_BATCH_SIZE], raise_on_any_failure=False
+        )
+        deleted += sum(1 for response in responses if response.status_code == 202)
+    
+    current_app.logger.info(f"Deleted {deleted}/{len(names)} photos from Azure Blob (batch)")
+    return deleted
+
+
+def generate_content_hash(data):
+    """Hash upload bytes to a short content key.
+    
+    Args:
+        data: Raw file bytes
+        
+    Returns:
+        str: 32-character hex digest (BLAKE2b, 16 bytes)
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def generate_content_filename(user_id, content_hash, upload_id, prefix=''):
+    """Generate a storage filename for one upload of an image.
+    
+    The user id is part of the key so one user deleting a photo never
+    removes a blob another user uploaded with identical bytes. The hash
+    only serves dedup; upload_id keeps each upload's blobs separate, so
+    cleaning up a deleted upload never removes a re-upload of the same
+    image.
+    
+    Args:
+        user_id: Owner of the photo
+        content_hash: Hash from generate_content_hash()
+        upload_id: Token unique to this upload, shared by image and thumbnail
+        prefix: Optional prefix (e.g., 'thumb_')
+        
+    Returns:
+        str: Filename with .jpg extension
+    """
+    return f"{prefix}{user_id}_{content_hash}_{upload_id}.jpg"
+
+
 def generate_unique_filename(original_filename, prefix=''):
     """Generate a unique filename for storage.
     
@@ -1,17 +1,21 @@
 # Gunicorn configuration file for Azure App Service
+import os
 
 # Binding
 bind = "0.0.0.0:8000"
 
 # Workers and threads - optimized for Socket.IO on Azure App Service
 # IMPORTANT: Socket.IO requires 1 worker without Redis message queue
-# Multiple workers cause "session ID unknown" errors because sessions aren't shared
-workers = 1
-threads = 8  # 1 worker x 8 threads = 8 concurrent requests (sufficient for moderate traffic)
+# Multiple workers cause "session ID unknown" errors because sessions aren't shared.
+# With REDIS_URL set, Socket.IO events fan out across workers through Redis, so
+# GUNICORN_WORKERS can be raised (long-polling still needs ARR affinity / sticky sessions)
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))  # 1 worker x 8 threads = 8 concurrent requests
 
 # Worker class - use gthread (threaded) for best Azure compatibility
 # This supports concurrent requests without needing gevent/eventlet
-worker_class = "gthread"
+# (the app runs Socket.IO in async_mode='threading', which gevent would not drive)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
 
 # Timeouts
 timeout = 120  # Worker timeout (seconds)
@@ -27,6 +31,17 @@ loglevel = "info"
 max_requests = 1000  # Restart workers after this many requests (prevents memory leaks)
 max_requests_jitter = 50  # Add randomness to prevent all workers restarting at once
 
-# Preload app for faster worker spawning
-preload_app = False
+# Preload app for faster worker spawning - imports, startup migrations and
+# create_all() run once in the master instead of on every max_requests
+# recycle; post_fork below drops the DB connections the fork inherits
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Discard pooled DB connections inherited from the master process."""
+    from app.extensions import db
+    
+    with worker.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
 
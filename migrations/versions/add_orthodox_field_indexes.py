@@ -0,0 +1,26 @@
+"""Index Orthodox profile fields used by discover filters
+
+Revision ID: add_orthodox_field_indexes
+Revises: add_orthodox_fields
+Create Date: 2026-10-15 23:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_orthodox_field_indexes'
+down_revision = 'add_orthodox_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_profiles_modesty_level', 'profiles', ['modesty_level'])
+    op.create_index('ix_profiles_marital_history', 'profiles', ['marital_history'])
+
+
+def downgrade():
+    op.drop_index('ix_profiles_marital_history', table_name='profiles')
+    op.drop_index('ix_profiles_modesty_level', table_name='profiles')
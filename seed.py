@@ -44,24 +44,33 @@ def create_test_users():
     """Create test users with profiles."""
     users_created = []
     
+    # Look up existing accounts in one query instead of one per email
+    emails = [f"test{i+1}@example.com" for i in range(20)]
+    existing_emails = {
+        email for (email,) in db.session.query(User.email).filter(User.email.in_(emails))
+    }
+    
+    # bcrypt is deliberately slow - hash the shared password once
+    password_hash = None
+    
     # Create 20 test users (10 male, 10 female)
-    for i in range(20):
+    for i, email in enumerate(emails):
         gender = 'male' if i < 10 else 'female'
         first_names = FIRST_NAMES_MALE if gender == 'male' else FIRST_NAMES_FEMALE
         
-        email = f"test{i+1}@example.com"
-        
         # Check if user already exists
-        existing = User.query.filter_by(email=email).first()
-        if existing:
+        if email in existing_emails:
             print(f"User {email} already exists, skipping...")
             continue
         
         user = User(email=email)
-        user.set_password('Password123')
+        if password_hash is None:
+            user.set_password('Password123')
+            password_hash = user.password_hash
+        else:
+            user.password_hash = password_hash
         user.is_verified = True
         db.session.add(user)
-        db.session.flush()  # Get the user ID
         
         # Create profile
         first_name = random.choice(first_names)
@@ -79,8 +88,9 @@ def create_test_users():
             city, state = random.choice(CITIES_CA)
             country = 'CA'
         
-        profile = Profile(
-            user_id=user.id,
+        # Attached via the relationship so users and profiles are inserted
+        # in batched statements at commit rather than flushed one by one
+        user.profile = Profile(
             first_name=first_name,
             last_name=last_name,
             date_of_birth=dob,
@@ -106,7 +116,6 @@ def create_test_users():
             looking_for_age_max=min(99, age + 8),
             relationship_goal=random.choice(RELATIONSHIP_GOALS),
         )
-        db.session.add(profile)
         
         users_created.append(user)
         print(f"Created user: {first_name} {last_name} ({email})")
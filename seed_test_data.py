@@ -5,8 +5,9 @@ Run with: python seed_test_data.py
 """
 
 from datetime import datetime, date
+from sqlalchemy import insert
 from app import create_app, db
-from app.models import User, Profile, Photo, Like, Match
+from app.models import User, Profile, Photo, Like, Match, Message, Block
 
 app = create_app()
 
@@ -192,15 +193,30 @@ TEST_USERS = [
 def clear_test_data():
     """Remove existing test users"""
     test_emails = [u["email"] for u in TEST_USERS]
-    for email in test_emails:
-        user = User.query.filter_by(email=email).first()
-        if user:
-            # Delete related data
-            Like.query.filter((Like.liker_id == user.id) | (Like.liked_id == user.id)).delete()
-            Match.query.filter((Match.user1_id == user.id) | (Match.user2_id == user.id)).delete()
-            Photo.query.filter_by(user_id=user.id).delete()
-            Profile.query.filter_by(user_id=user.id).delete()
-            db.session.delete(user)
+    user_ids = [
+        user_id for (user_id,) in db.session.query(User.id).filter(User.email.in_(test_emails))
+    ]
+    if user_ids:
+        # One IN-list DELETE per table; nothing is loaded, so skip session sync.
+        # Messages and blocks were removed by the ORM cascade on User before.
+        match_ids = db.session.query(Match.id).filter(
+            Match.user1_id.in_(user_ids) | Match.user2_id.in_(user_ids)
+        )
+        Message.query.filter(
+            Message.sender_id.in_(user_ids) | Message.match_id.in_(match_ids)
+        ).delete(synchronize_session=False)
+        Like.query.filter(
+            Like.liker_id.in_(user_ids) | Like.liked_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+        Match.query.filter(
+            Match.user1_id.in_(user_ids) | Match.user2_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+        Block.query.filter(
+            Block.blocker_id.in_(user_ids) | Block.blocked_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+        Photo.query.filter(Photo.user_id.in_(user_ids)).delete(synchronize_session=False)
+        Profile.query.filter(Profile.user_id.in_(user_ids)).delete(synchronize_session=False)
+        User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
     db.session.commit()
     print("✓ Cleared existing test data")
 
@@ -208,16 +224,25 @@ def clear_test_data():
 def create_test_users():
     """Create test users with profiles and photos"""
     created_users = []
+    password_hashes = {}  # bcrypt is deliberately slow - hash each distinct password once
     
     for user_data in TEST_USERS:
         # Create user
         user = User(email=user_data["email"])
-        user.set_password(user_data["password"])
+        password = user_data["password"]
+        if password in password_hashes:
+            user.password_hash = password_hashes[password]
+        else:
+            user.set_password(password)
+            password_hashes[password] = user.password_hash
         user.is_verified = True
         user.email_verified = True
         db.session.add(user)
-        db.session.flush()  # Get the user ID
-        
+        created_users.append(user)
+    
+    db.session.flush()  # Get all user IDs in one batched INSERT
+    
+    for user, user_data in zip(created_users, TEST_USERS):
         # Create profile
         profile_data = user_data["profile"]
         profile = Profile(user_id=user.id)
@@ -228,20 +253,21 @@ def create_test_users():
         
         db.session.add(profile)
         
-        # Create photos
-        for i, photo_url in enumerate(user_data["photos"]):
-            photo = Photo(
-                user_id=user.id,
-                filename=f"test_photo_{user.id}_{i}.jpg",
-                url=photo_url,
-                is_primary=(i == 0),
-                display_order=i
-            )
-            db.session.add(photo)
-        
-        created_users.append(user)
         print(f"✓ Created user: {user_data['profile']['first_name']} {user_data['profile']['last_name']} ({user_data['email']})")
     
+    # Create photos - ids aren't needed back, so one executemany INSERT
+    db.session.execute(insert(Photo), [
+        {
+            "user_id": user.id,
+            "filename": f"test_photo_{user.id}_{i}.jpg",
+            "url": photo_url,
+            "is_primary": i == 0,
+            "display_order": i,
+        }
+        for user, user_data in zip(created_users, TEST_USERS)
+        for i, photo_url in enumerate(user_data["photos"])
+    ])
+    
     db.session.commit()
     return created_users
 
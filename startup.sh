@@ -3,5 +3,9 @@
 # Azure App Service startup script
 # This ensures our gunicorn.conf.py is used
 
-# Run gunicorn with our config file
-gunicorn --config gunicorn.conf.py wsgi:app
+# Apply schema migrations once, before any app process starts; refuse to
+# start against a schema the models don't match
+python migrate.py || exit 1
+
+# Run gunicorn with our config file (migrations already applied above)
+SKIP_MIGRATIONS=1 gunicorn --config gunicorn.conf.py wsgi:app